@@ -0,0 +1,343 @@
+# benchmark.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Timing harness for the search code.  Each benchmark prints a small table; run
+one or more of them by name:
+
+> python benchmark.py closedSet
+
+Run with no arguments to list the available benchmarks.
+"""
+
+import os, sys, time, heapq, random, cPickle
+import layout, pacman, search, searchAgents, textDisplay, util
+
+def loadStates():
+    "Returns (name, GameState) for every layout in layouts/, sorted by name"
+    states = []
+    for fileName in sorted(os.listdir('layouts')):
+        if not fileName.endswith('.lay'): continue
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(fileName), 0)
+        states.append((fileName[:-4], state))
+    return states
+
+def timeSearch(searchFunction, makeProblem, minTime=0.1):
+    """
+    Runs searchFunction on fresh problems from makeProblem() until at least
+    minTime seconds have passed; returns (expanded per run, seconds per run).
+    """
+    runs, expanded, start = 0, 0, time.time()
+    while runs == 0 or time.time() - start < minTime:
+        problem = makeProblem()
+        searchFunction(problem)
+        expanded += problem._expanded
+        runs += 1
+    return expanded / runs, (time.time() - start) / runs
+
+def rate(expanded, seconds):
+    return expanded / max(seconds, 1e-6)
+
+########################
+# Closed list variants #
+########################
+
+class ListClosedSet:
+    "The old list-backed closed list: O(n) membership, kept as a baseline"
+    def __init__(self):
+        self.list = []
+
+    def add(self, state):
+        self.list.append(state)
+
+    def __contains__(self, state):
+        return state in self.list
+
+class DenseClosedSet:
+    """
+    A closed list in a byte array with a slot per state, indexed by
+    stateIndex(state).  Its Python-level add and __contains__ cost more than
+    a set's, so it is kept here for comparison only.
+    """
+    def __init__(self, numStates, stateIndex):
+        self.closed = bytearray(numStates)
+        self.stateIndex = stateIndex
+
+    def add(self, state):
+        self.closed[self.stateIndex(state)] = 1
+
+    def __contains__(self, state):
+        return self.closed[self.stateIndex(state)] == 1
+
+def benchmarkClosedSet():
+    """
+    Expansions per second of BFS and DFS on every layout with the old list
+    closed list, the default set and a dense array.  The
+    PositionSearchProblem goal is unreachable so the whole maze is explored.
+    """
+    def denseClosedSet(problem):
+        height = problem.walls.height
+        return DenseClosedSet(problem.walls.width * height, lambda (x, y): x * height + y)
+    def denseCornersClosedSet(problem):
+        return DenseClosedSet((problem.walls.width * problem.walls.height) << 4, lambda state: state)
+    closedSets = [('list', lambda problem: ListClosedSet()),
+                  ('set', lambda problem: set()),
+                  ('dense', denseClosedSet)]
+    print '%-20s %-4s %8s' % ('layout', 'alg', 'expanded') + ''.join(['%12s' % name for name, _ in closedSets])
+    for name, state in loadStates():
+        makeProblem = lambda: searchAgents.PositionSearchProblem(state, goal=(-1, -1), warn=False, visualize=False)
+        for algName, alg in [('bfs', search.breadthFirstSearch), ('dfs', search.depthFirstSearch)]:
+            row = '%-20s %-4s' % (name, algName)
+            for closedName, makeClosedSet in closedSets:
+                expanded, seconds = timeSearch(lambda p: alg(p, makeClosedSet(p)), makeProblem)
+                if closedName == 'list': row += ' %8d' % expanded
+                row += '%12.0f' % rate(expanded, seconds)
+            print row
+
+    # Corners states carry the visited corners, so the closed list grows to
+    # about 16 entries per cell and the list baseline goes quadratic.  The
+    # states are already ints 0 .. cells * 16 - 1, the dense list's slots.
+    closedSets[2] = ('dense', denseCornersClosedSet)
+    print '\n%-20s %-4s %8s' % ('CornersProblem', 'alg', 'expanded') + ''.join(['%12s' % name for name, _ in closedSets])
+    for name, state in loadStates():
+        if not name.endswith('Corners'): continue
+        row = '%-20s %-4s' % (name, 'bfs')
+        for closedName, makeClosedSet in closedSets:
+            expanded, seconds = timeSearch(lambda p: search.breadthFirstSearch(p, makeClosedSet(p)),
+                                           lambda: searchAgents.CornersProblem(state))
+            if closedName == 'list': row += ' %8d' % expanded
+            row += '%12.0f' % rate(expanded, seconds)
+        print row
+
+##########################
+# Priority queue variants #
+##########################
+
+class LegacyPriorityQueue:
+    "The old heapq queue whose update() scans the heap and re-heapifies"
+    def  __init__(self):
+        self.heap = []
+        self.count = 0
+
+    def push(self, item, priority):
+        entry = (priority, self.count, item)
+        heapq.heappush(self.heap, entry)
+        self.count += 1
+
+    def pop(self):
+        (_, _, item) = heapq.heappop(self.heap)
+        return item
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def update(self, item, priority):
+        for index, (p, c, i) in enumerate(self.heap):
+            if i == item:
+                if p <= priority:
+                    break
+                del self.heap[index]
+                self.heap.append((priority, c, item))
+                heapq.heapify(self.heap)
+                break
+        else:
+            self.push(item, priority)
+
+def benchmarkPriorityQueue(sizes=(10 ** 5, 10 ** 6), numUpdates=20):
+    """
+    Micro-benchmark of util.PriorityQueue against the old heapq queue: n
+    pushes, numUpdates decrease-keys on random items, then n pops.
+    Times are microseconds per operation.
+    """
+    print '%-8s %-8s %10s %12s %10s' % ('queue', 'n', 'push', 'update', 'pop')
+    for n in sizes:
+        rng = random.Random(n)
+        priorities = [rng.random() for i in range(n)]
+        updates = [(rng.randrange(n), -rng.random()) for i in range(numUpdates)]
+        for name, queueClass in [('legacy', LegacyPriorityQueue), ('indexed', util.PriorityQueue)]:
+            queue = queueClass()
+            start = time.time()
+            for item, priority in enumerate(priorities):
+                queue.push(item, priority)
+            pushTime = time.time() - start
+            start = time.time()
+            for item, priority in updates:
+                queue.update(item, priority)
+            updateTime = time.time() - start
+            start = time.time()
+            while not queue.isEmpty():
+                queue.pop()
+            popTime = time.time() - start
+            print '%-8s %-8d %10.2f %12.2f %10.2f' % (name, n, 1e6 * pushTime / n,
+                                                    1e6 * updateTime / numUpdates, 1e6 * popTime / n)
+
+##############
+# Grid access #
+##############
+
+def timeCalls(function, minTime=0.2):
+    "Calls function() until minTime seconds have passed; returns seconds per call"
+    calls, start = 0, time.time()
+    while calls == 0 or time.time() - start < minTime:
+        function()
+        calls += 1
+    return (time.time() - start) / calls
+
+def benchmarkGrid(layoutNames=('mediumClassic', 'bigSearch', 'bigMaze')):
+    """
+    Microseconds per call of the game.Grid operations the engine leans on:
+    count() on the food, copy() of the food, reading every cell of the
+    walls through grid[x][y], hashing the food and eating a dot with
+    withoutCell (what a FoodSearchProblem successor does).
+    """
+    print '%-16s %10s %10s %10s %10s %10s' % ('layout', 'count', 'copy', 'readAll', 'hash', 'without')
+    for name in layoutNames:
+        lay = layout.getLayout(name)
+        food, walls = lay.food, lay.walls
+        cells = [(x, y) for x in range(walls.width) for y in range(walls.height)]
+        def readAll():
+            for x, y in cells:
+                walls[x][y]
+        dot = food.asList()[0]
+        times = [timeCalls(food.count), timeCalls(food.copy), timeCalls(readAll), timeCalls(food.__hash__),
+                 timeCalls(lambda: food.withoutCell(*dot))]
+        print '%-16s' % name + ''.join(['%10.2f' % (1e6 * t) for t in times])
+
+#######################
+# Successor functions #
+#######################
+
+def benchmarkSuccessors(layoutNames=('mediumCorners', 'bigCorners')):
+    """
+    getSuccessors calls per second over every open cell of a layout for the
+    position, any-food, corners and food problems, and whole-maze BFS
+    expansions per second on the PositionSearchProblem.
+    """
+    problems = [('position', lambda state: searchAgents.PositionSearchProblem(state, warn=False, visualize=False),
+                 lambda problem, cell: cell),
+                ('anyFood', searchAgents.AnyFoodSearchProblem, lambda problem, cell: cell),
+                ('corners', searchAgents.CornersProblem,
+                 lambda problem, (x, y): (x * problem.walls.height + y) << 4),
+                ('food', searchAgents.FoodSearchProblem,
+                 lambda problem, cell: (cell, problem.getStartState()[1]))]
+    print '%-16s' % 'layout' + ''.join(['%12s' % name for name, _, _ in problems]) + '%12s' % 'bfs'
+    for name in layoutNames:
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(name), 0)
+        row = '%-16s' % name
+        for problemName, makeProblem, makeState in problems:
+            problem = makeProblem(state)
+            states = [makeState(problem, cell) for cell in problem.walls.asList(False)]
+            calls, start = 0, time.time()
+            while calls == 0 or time.time() - start < 0.2:
+                for searchState in states:
+                    problem.getSuccessors(searchState)
+                calls += len(states)
+            row += '%12.0f' % rate(calls, time.time() - start)
+        expanded, seconds = timeSearch(search.breadthFirstSearch,
+            lambda: searchAgents.PositionSearchProblem(state, goal=(-1, -1), warn=False, visualize=False))
+        print row + '%12.0f' % rate(expanded, seconds)
+
+#####################
+# Whole-agent timing #
+#####################
+
+def benchmarkCorners(layoutNames=('mediumCorners', 'bigCorners')):
+    """
+    A* with cornersHeuristic on the CornersProblem (what AStarCornersAgent
+    runs): expansions, seconds and expansions per second.
+    """
+    print '%-20s %8s %8s %10s' % ('layout', 'expanded', 'seconds', 'exp/s')
+    for name in layoutNames:
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(name), 0)
+        heuristic = searchAgents.cornersHeuristic
+        expanded, seconds = timeSearch(lambda p: search.aStarSearch(p, heuristic),
+                                       lambda: searchAgents.CornersProblem(state), minTime=1.0)
+        print '%-20s %8d %8.3f %10.0f' % (name, expanded, seconds, rate(expanded, seconds))
+
+def legacyClosestDotActions(agent, state):
+    "The old ClosestDotSearchAgent loop: a fresh BFS and GameState replay per dot"
+    actions = []
+    while state.getFood().count() > 0:
+        nextPathSegment = agent.findPathToClosestDot(state)
+        actions += nextPathSegment
+        for action in nextPathSegment:
+            state = state.generateSuccessor(0, action)
+    return actions
+
+def benchmarkClosestDot(layoutNames=('mediumSearch', 'bigSearch')):
+    """
+    ClosestDotSearchAgent planning time with the old search-and-replay loop
+    and with ClosestDotPlanner; the routes must be identical.
+    """
+    agent = searchAgents.ClosestDotSearchAgent()
+    print '%-16s %8s %10s %10s' % ('layout', 'cost', 'legacy', 'planner')
+    for name in layoutNames:
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(name), 0)
+        routes, times = [], []
+        for plan in [lambda state: legacyClosestDotActions(agent, state),
+                     lambda state: searchAgents.ClosestDotPlanner(state.getWalls()).plan(
+                         state.getPacmanPosition(), state.getFood())]:
+            runs, start = 0, time.time()
+            while runs == 0 or time.time() - start < 1.0:
+                route = plan(state)
+                runs += 1
+            routes.append(route)
+            times.append((time.time() - start) / runs)
+        if routes[0] != routes[1]:
+            raise Exception('ClosestDotPlanner route differs from the legacy route on ' + name)
+        print '%-16s %8d %10.4f %10.4f' % (name, len(routes[0]), times[0], times[1])
+
+def benchmarkReplay(recordings=(('recordings/mediumMaze-bfs', 442),)):
+    """
+    Loads and replays games recorded (with -r) before Grid was a bitboard;
+    each must replay to the score it was recorded with.
+    """
+    print '%-24s %8s %10s %10s' % ('recording', 'score', 'load', 'replay')
+    for fileName, score in recordings:
+        start = time.time()
+        f = open(fileName)
+        try: recorded = cPickle.load(f)
+        finally: f.close()
+        loaded = time.time()
+        state = pacman.replayGame(recorded['layout'], recorded['actions'], textDisplay.NullGraphics())
+        if state.getScore() != score:
+            raise Exception('%s replays to score %d, not %d' % (fileName, state.getScore(), score))
+        print '%-24s %8d %10.4f %10.4f' % (fileName[len('recordings/'):], score, loaded - start, time.time() - loaded)
+
+BENCHMARKS = {
+    'corners': benchmarkCorners,
+    'grid': benchmarkGrid,
+    'closedSet': benchmarkClosedSet,
+    'closestDot': benchmarkClosestDot,
+    'priorityQueue': benchmarkPriorityQueue,
+    'replay': benchmarkReplay,
+    'successors': benchmarkSuccessors,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    if not names:
+        print 'Usage: python benchmark.py <name> [<name> ...]'
+        for name in sorted(BENCHMARKS):
+            print '  %-12s %s' % (name, BENCHMARKS[name].__doc__.strip().split('\n')[0])
+        sys.exit(1)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise Exception('Unknown benchmark: ' + name)
+        print '*** %s' % name
+        BENCHMARKS[name]()
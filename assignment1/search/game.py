@@ -21,7 +21,7 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 from util import *
-import time, os
+import time, os, random
 import traceback
 import sys
 
@@ -67,14 +67,18 @@ class Directions:
                WEST: EAST,
                STOP: STOP}
 
-class Configuration:
+class Configuration(object):
     """
     A Configuration holds the (x,y) coordinate of a character, along with its
     traveling direction.
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are never changed once made, so the engine shares them:
+    internConfiguration returns one Configuration per position and direction.
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -102,6 +106,10 @@ class Configuration:
     def __str__(self):
         return "(x,y)="+str(self.pos)+", "+str(self.direction)
 
+    def __reduce__(self):
+        # Slotted classes need this to pickle; unpickling interns again
+        return internConfiguration, (self.pos, self.direction)
+
     def generateSuccessor(self, vector):
         """
         Generates a new configuration reached by translating the current
@@ -115,12 +123,35 @@ class Configuration:
         direction = Actions.vectorToDirection(vector)
         if direction == Directions.STOP:
             direction = self.direction # There is no stop direction
-        return Configuration((x + dx, y+dy), direction)
+        return internConfiguration((x + dx, y+dy), direction)
+
+CONFIGURATIONS = {}
+
+def getSlotsState(self):
+    "A __getstate__ for slotted classes: the slots that are set, by name"
+    return dict([(name, getattr(self, name)) for name in self.__slots__ if hasattr(self, name)])
+
+def setSlotsState(self, state):
+    for name, value in state.items():
+        setattr(self, name, value)
 
-class AgentState:
+def internConfiguration(pos, direction):
+    """
+    Returns the shared Configuration at pos facing direction.  The key
+    carries the coordinate types, so (3, 4) and (3.0, 4.0) stay distinct.
+    """
+    x, y = pos
+    key = (x, y, direction, type(x), type(y))
+    configuration = CONFIGURATIONS.get(key)
+    if configuration == None:
+        configuration = CONFIGURATIONS[key] = Configuration(pos, direction)
+    return configuration
+
+class AgentState(object):
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer', 'numCarrying', 'numReturned')
 
     def __init__( self, startConfiguration, isPacman ):
         self.start = startConfiguration
@@ -144,6 +175,9 @@ class AgentState:
     def __hash__(self):
         return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
 
+    __getstate__ = getSlotsState
+    __setstate__ = setSlotsState
+
     def copy( self ):
         state = AgentState( self.start, self.isPacman )
         state.configuration = self.configuration
@@ -159,71 +193,161 @@ class AgentState:
     def getDirection(self):
         return self.configuration.getDirection()
 
-class Grid:
+class GridColumn(list):
+    """
+    A view of column x of a bitboard Grid.  The column's cells are unpacked
+    into the list once, so grid[x][y] reads are plain list reads; writes
+    through grid[x][y] = value update both the list and the grid's board.
+    """
+    __slots__ = ('board', 'offset', 'height')
+
+    def __setitem__(self, y, value):
+        value = bool(value)
+        if list.__getitem__(self, y) != value:
+            board = self.board
+            bit = 1 << (self.offset + y % self.height)
+            if value:
+                board[0] |= bit
+                board[1] += 1
+            else:
+                board[0] &= ~bit
+                board[1] -= 1
+        list.__setitem__(self, y, value)
+
+class Grid(object):
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
+    A 2-dimensional array of booleans stored as a bitboard.  Data is accessed
     via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
     y vertical and the origin (0,0) in the bottom left corner.
 
+    The cells live in self.board = [bits, numTrue]: cell (x,y) is bit
+    x * height + y of the int bits, and numTrue is the number of set bits.
+    Copying, hashing, comparing and counting work on these two ints instead
+    of the cells.  The GridColumn views grid[x] are made on first use; they
+    point at the board rather than the grid, so grids are freed as soon as
+    they are dropped.
+
     The __str__ method constructs an output that is oriented like a pacman board.
     """
-    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+    __slots__ = ('width', 'height', 'board', 'columns')
+    CELLS_PER_INT = 30
+
+    def __init__(self, width=0, height=0, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
-        self.CELLS_PER_INT = 30
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        self.board = [0, 0]
+        if initialValue:
+            self.board = [(1 << (width * height)) - 1, width * height]
+        self.columns = [None] * width
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        column = self.columns[i]
+        if column is None:
+            column = self.columns[i] = self._makeColumn(i % self.width)
+        return column
+
+    def _makeColumn(self, x):
+        height = self.height
+        columnBits = (self.board[0] >> (x * height)) & ((1 << height) - 1)
+        digits = bin(columnBits | (1 << height))[:2:-1]     # height binary digits, least significant first
+        column = GridColumn([digit == '1' for digit in digits])
+        column.board, column.offset, column.height = self.board, x * height, height
+        return column
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
         if other == None: return False
-        return self.data == other.data
+        return self.board[0] == other.board[0] and self.width == other.width and self.height == other.height
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        # The same value the list-of-lists Grid got by summing 2 ** cellIndex
+        return hash(self.board[0])
+
+    def __reduce__(self):
+        return reconstituteGrid, (self.packBits(),)
+
+    def __setstate__(self, state):
+        # Grids pickled before the bitboard (in recorded games) were old-style
+        # instances whose state is their __dict__, with the cells as a list
+        # of columns in data
+        width, height = state['width'], state['height']
+        Grid.__init__(self, width, height)
+        bits = 0
+        for x in range(width):
+            for y in range(height):
+                if state['data'][x][y]:
+                    bits |= 1 << (x * height + y)
+        self.board = [bits, bin(bits).count('1')]
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g = Grid.__new__(Grid)      # Skips __init__: its blank board would be thrown away
+        g.width, g.height, g.board = self.width, self.height, self.board[:]
+        g.columns = [None] * self.width
         return g
 
     def deepCopy(self):
         return self.copy()
 
-    def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
+    def withoutCell(self, x, y):
+        "Returns the grid with cell (x,y) False: see withoutBits"
+        return self.withoutBits(1 << (x * self.height + y))
+
+    def withoutBits(self, bits):
+        """
+        Returns a copy of the grid with the cells of bits (bit x * height + y
+        for cell (x,y)) set False, or the grid itself if they already are.
+        Only the board ints change; no column view is built.
+        """
+        board, count = self.board
+        eaten = board & bits
+        if not eaten:
+            return self
+        g = Grid.__new__(Grid)
+        g.width, g.height = self.width, self.height
+        g.board = [board ^ eaten, count - bin(eaten).count('1')]
+        g.columns = [None] * self.width
         return g
 
+    def shallowCopy(self):
+        # A shallow copy shares its cells with this grid, so that writes to
+        # either show up in both: that is the grid itself
+        return self
+
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        if item == True:
+            return self.board[1]
+        if item == False:
+            return self.width * self.height - self.board[1]
+        return 0
 
     def asList(self, key = True):
+        bits = self.board[0]
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
+        # Scan the binary digits, least significant first, for the set bits
+        digits = bin(bits)[:1:-1]
+        height = self.height
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+        i = digits.find('1')
+        while i >= 0:
+            list.append( (i // height, i % height) )
+            i = digits.find('1', i + 1)
         return list
 
     def packBits(self):
@@ -236,8 +360,7 @@ class Grid:
         currentInt = 0
         for i in range(self.height * self.width):
             bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
+            if self.board[0] >> i & 1:
                 currentInt += 2 ** bit
             if (i + 1) % self.CELLS_PER_INT == 0:
                 bits.append(currentInt)
@@ -254,12 +377,14 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
+        self.board[0], self.board[1] = 0, 0
         cell = 0
         for packed in bits:
             for bit in self._unpackInt(packed, self.CELLS_PER_INT):
                 if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
+                if bit:
+                    self.board[0] |= 1 << cell
+                    self.board[1] += 1
                 cell += 1
 
     def _unpackInt(self, packed, size):
@@ -297,6 +422,8 @@ class Actions:
 
     _directionsAsList = _directions.items()
 
+    _vectors = {}   # (direction, speed, type(speed)) -> shared movement vector
+
     TOLERANCE = .001
 
     def reverseDirection(action):
@@ -325,8 +452,12 @@ class Actions:
     vectorToDirection = staticmethod(vectorToDirection)
 
     def directionToVector(direction, speed = 1.0):
-        dx, dy =  Actions._directions[direction]
-        return (dx * speed, dy * speed)
+        key = (direction, speed, type(speed))
+        vector = Actions._vectors.get(key)
+        if vector == None:
+            dx, dy =  Actions._directions[direction]
+            vector = Actions._vectors[key] = (dx * speed, dy * speed)
+        return vector
     directionToVector = staticmethod(directionToVector)
 
     def getPossibleActions(config, walls):
@@ -368,21 +499,55 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
-class GameStateData:
-    """
+ZOBRIST_KEYS = {}
+ZOBRIST_RANDOM = random.Random(0x2a0b)   # Private, so games' random streams are untouched
 
+def zobristKey(feature):
+    """
+    Returns the random 63-bit key of a state feature (any hashable tuple),
+    drawing it on first use.  Features that compare equal, such as
+    positions (3, 4) and (3.0, 4.0), share a key.
+    """
+    key = ZOBRIST_KEYS.get(feature)
+    if key == None:
+        key = ZOBRIST_KEYS[feature] = ZOBRIST_RANDOM.getrandbits(63)
+    return key
+
+def agentZobristKey(agentIndex, agentState):
+    "The Zobrist key of agent agentIndex being in agentState"
+    configuration = agentState.configuration
+    if configuration == None:
+        return zobristKey(('agent', agentIndex, None, None, agentState.scaredTimer))
+    return zobristKey(('agent', agentIndex, configuration.pos, configuration.direction, agentState.scaredTimer))
+
+class GameStateData(object):
     """
+    A successor data packet shares the food, the capsules list and the
+    AgentStates of its predecessor.  Code that changes them must copy first:
+    food and capsules are replaced rather than edited, and agentStateForWrite
+    returns an AgentState that is safe to edit.
+
+    Each packet carries a Zobrist hash of its agent states, food and
+    capsules: the XOR of the zobristKey of every agent state, food dot and
+    capsule.  A successor inherits its predecessor's hash and updateHash
+    XORs out and in only the keys of what changed, so hashing is O(1).
+    """
+    __slots__ = ('food', 'capsules', 'agentStates', '_copiedAgentStates', 'layout', '_eaten',
+                 'score', '_hash', '_foodEaten', '_foodAdded', '_capsuleEaten', '_agentMoved',
+                 '_lose', '_win', 'scoreChange')
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
         """
         if prevState != None:
             self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
+            self._copiedAgentStates = 0     # Bit i set once agentStates[i] is our own copy
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._hash = prevState._hash
 
         self._foodEaten = None
         self._foodAdded = None
@@ -394,8 +559,10 @@ class GameStateData:
 
     def deepCopy( self ):
         state = GameStateData( self )
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates( self.agentStates )
+        state._copiedAgentStates = -1
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -408,14 +575,26 @@ class GameStateData:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def agentStateForWrite( self, agentIndex ):
+        """
+        Returns agentStates[agentIndex], first replacing it with a copy if it
+        is still shared with the predecessor.
+        """
+        if not self._copiedAgentStates >> agentIndex & 1:
+            self.agentStates[agentIndex] = self.agentStates[agentIndex].copy()
+            self._copiedAgentStates |= 1 << agentIndex
+        return self.agentStates[agentIndex]
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
         """
         if other == None: return False
+        if self is other: return True
         # TODO Check for type of other
+        # Shared parts compare by identity, without looking inside
         if not self.agentStates == other.agentStates: return False
-        if not self.food == other.food: return False
+        if not (self.food is other.food or self.food == other.food): return False
         if not self.capsules == other.capsules: return False
         if not self.score == other.score: return False
         return True
@@ -424,17 +603,50 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        # Not hash(score), as hash(-1) == hash(-2)
+        return self._hash ^ zobristKey(('score', self.score))
+
+    __getstate__ = getSlotsState
+
+    def __setstate__( self, state ):
+        setSlotsState( self, state )
+        self._copiedAgentStates = -1    # Unpickled AgentStates belong to nobody else
+        self._hash = self.computeHash()  # Zobrist keys are drawn per process
+
+    def computeHash( self ):
+        "Returns the Zobrist hash of the agent states, food and capsules, from scratch"
+        h = 0
+        for agentIndex, agentState in enumerate(self.agentStates):
+            h ^= agentZobristKey(agentIndex, agentState)
+        for x, y in self.food.asList():
+            h ^= zobristKey(('food', x, y))
+        for x, y in self.capsules:
+            h ^= zobristKey(('capsule', x, y))
+        return h
+
+    def updateHash( self, prevState ):
+        """
+        Updates the hash inherited from prevState, the data packet this one
+        was generated from, for the agent states rewritten through
+        agentStateForWrite and the food and capsule eaten.
+        """
+        h = self._hash
+        copied, agentIndex = self._copiedAgentStates, 0
+        while copied:
+            if copied & 1:
+                h ^= agentZobristKey(agentIndex, prevState.agentStates[agentIndex])
+                h ^= agentZobristKey(agentIndex, self.agentStates[agentIndex])
+            copied >>= 1
+            agentIndex += 1
+        if self._foodEaten != None:
+            h ^= zobristKey(('food',) + tuple(self._foodEaten))
+        if self._capsuleEaten != None:
+            h ^= zobristKey(('capsule',) + tuple(self._capsuleEaten))
+        self._hash = h
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        map = [[None] * height for x in range(width)]     # Characters, so not a Grid
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
@@ -455,7 +667,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        rows = [''.join([map[x][y] for x in range(width)]) for y in range(height)]
+        rows.reverse()
+        return '\n'.join(rows) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -501,8 +715,10 @@ class GameStateData:
             if not isPacman:
                 if numGhosts == numGhostAgents: continue # Max ghosts reached already
                 else: numGhosts += 1
-            self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+            self.agentStates.append( AgentState( internConfiguration( pos, Directions.STOP), isPacman) )
+        self._copiedAgentStates = -1     # A new packet owns all its AgentStates
         self._eaten = [False for a in self.agentStates]
+        self._hash = self.computeHash()
 
 try:
     import boinc
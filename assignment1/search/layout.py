@@ -18,10 +18,15 @@ import os
 import random
 
 VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are never changed once built, so one Layout is shared by every
+    game state (and every game) played on it.  Get them from getLayout or
+    getLayoutFromText, which hand out one Layout per distinct layout text.
     """
 
     def __init__(self, layoutText):
@@ -35,6 +40,7 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.actionTables = {}  # Legal moves per cell, filled in by the game rules
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -90,7 +96,19 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        # Layouts are immutable, so the copy can be the layout itself
+        return self
+
+    def __getstate__(self):
+        # The action tables are rebuilt on demand, and recorded games from
+        # before them have none
+        state = self.__dict__.copy()
+        del state['actionTables']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.actionTables = {}
 
     def processLayoutText(self, layoutText):
         """
@@ -142,8 +160,18 @@ def getLayout(name, back = 2):
         os.chdir(curdir)
     return layout
 
+def getLayoutFromText(layoutText):
+    """
+    Returns the Layout for a list of layout lines, parsing them only the first
+    time that text is seen.
+    """
+    key = tuple(layoutText)
+    if key not in LAYOUT_CACHE:
+        LAYOUT_CACHE[key] = Layout(list(layoutText))
+    return LAYOUT_CACHE[key]
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    try: return getLayoutFromText([line.strip() for line in f])
     finally: f.close()
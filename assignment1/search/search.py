@@ -72,7 +72,7 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
-def depthFirstSearch(problem):
+def depthFirstSearch(problem, closedSet=None):
     """
     Search the deepest nodes in the search tree first.
 
@@ -85,27 +85,33 @@ def depthFirstSearch(problem):
     print "Start:", problem.getStartState()
     print "Is the start a goal?", problem.isGoalState(problem.getStartState())
     print "Start's successors:", problem.getSuccessors(problem.getStartState())
+
+    closedSet is an optional empty closed list: any object with add(state)
+    and "state in closedSet", a set by default.
     """
     "*** YOUR CODE HERE ***"
 
     frontier = util.Stack()                     # Open list
-    visited = []                                # Closed list
+    visited = closedSet                         # Closed list
+    if visited is None:
+        visited = set()
+    nodes = util.SearchNodes()                  # Parent pointers for path rebuilding
     startPosition = problem.getStartState()
-    # Keep track of current position, parent's position and the path so far
-    startNode = (startPosition, None, [])
+    # Keep track of current position and the index of its search node
+    startNode = (startPosition, nodes.addRoot())
     frontier.push(startNode)
 
     while not frontier.isEmpty():
         node = frontier.pop()
         position = node[0]
-        path = node[2]
+        nodeIndex = node[1]
         if position in visited:
             continue
 
         # Mark node as visited
-        visited.append(position)
+        visited.add(position)
         if (problem.isGoalState(position)):
-            return path                         # Path so far i.e. list of actions
+            return nodes.path(nodeIndex)        # Path so far i.e. list of actions
 
         successors = problem.getSuccessors(position)
         for successor in successors:
@@ -113,70 +119,70 @@ def depthFirstSearch(problem):
             succDirection = successor[1]
             # Path checking
             if succPosition not in visited:
-                frontier.push((succPosition, position, path + [succDirection]))
+                frontier.push((succPosition, nodes.add(nodeIndex, succDirection)))
 
     return []
 
-def breadthFirstSearch(problem):
+def breadthFirstSearch(problem, closedSet=None):
     """Search the shallowest nodes in the search tree first."""
     "*** YOUR CODE HERE ***"
     frontier = util.Queue()
-    visited = []
+    visited = closedSet
+    if visited is None:
+        visited = set()
+    nodes = util.SearchNodes()
     startPosition = problem.getStartState()
-    startNode = (startPosition, None, [])
+    startNode = (startPosition, nodes.addRoot())
     frontier.push(startNode)
 
     while not frontier.isEmpty():
         node = frontier.pop()
         position = node[0]
-        path = node[2]
+        nodeIndex = node[1]
         if position in visited:
             continue
 
-        visited.append(position)
+        visited.add(position)
         if (problem.isGoalState(position)):
-            return path
+            return nodes.path(nodeIndex)
 
+        # Path checking, then enqueue all new successors in one call
         successors = problem.getSuccessors(position)
-        for successor in successors:
-            succPosition = successor[0]
-            succDirection = successor[1]
-            # Path checking
-            if succPosition not in visited:
-                frontier.push((succPosition, position, path + [succDirection]))
+        frontier.pushMany([(succPosition, nodes.add(nodeIndex, succDirection))
+                           for succPosition, succDirection, succCost in successors
+                           if succPosition not in visited])
 
     return []
 
 def uniformCostSearch(problem):
     """Search the node of least total cost first."""
     "*** YOUR CODE HERE ***"
-    frontier = util.PriorityQueue()
+    frontier = util.PriorityQueue()                 # One entry per state, lowered with update()
     seen = dict()                                   # seen is dict storing min cost
+    bestNode = dict()                               # node index of the cheapest path found so far
+    nodes = util.SearchNodes()
     startPosition = problem.getStartState()
     seen[startPosition] = 0
-
-    startNode = (startPosition, None, [], 0)        # curPosition, parent's postition, path, cost
-    frontier.push(startNode, startNode[3])
+    bestNode[startPosition] = nodes.addRoot()
+    frontier.push(startPosition, 0)
 
     while not frontier.isEmpty():
-        node = frontier.pop()
-        position = node[0]
-        path = node[2]
-        cost = node[3]
-
-        if cost <= seen[position]:                  # Only expand if cheapest path
-            if (problem.isGoalState(position)):
-                return path
-
-            successors = problem.getSuccessors(position)
-            for successor in successors:
-                succPosition = successor[0]
-                succDirection = successor[1]
-                succCost = successor[2]
-                if succPosition not in seen or (cost + succCost < seen[succPosition]):
-                    succNode = (succPosition, position, path + [succDirection], cost + succCost)
-                    frontier.push(succNode, succNode[3])
-                    seen[succPosition] = cost + succCost
+        position = frontier.pop()
+        nodeIndex = bestNode[position]
+        cost = seen[position]
+
+        if (problem.isGoalState(position)):
+            return nodes.path(nodeIndex)
+
+        successors = problem.getSuccessors(position)
+        for successor in successors:
+            succPosition = successor[0]
+            succDirection = successor[1]
+            succCost = successor[2]
+            if succPosition not in seen or (cost + succCost < seen[succPosition]):
+                seen[succPosition] = cost + succCost
+                bestNode[succPosition] = nodes.add(nodeIndex, succDirection)
+                frontier.update(succPosition, cost + succCost)
     return []
 
 def nullHeuristic(state, problem=None):
@@ -191,38 +197,37 @@ def aStarSearch(problem, heuristic=nullHeuristic):
     "*** YOUR CODE HERE ***"
     frontier = util.PriorityQueue()
     seen = dict()
+    bestNode = dict()
+    nodes = util.SearchNodes()
     startPosition = problem.getStartState()
     seen[startPosition] = 0
+    bestNode[startPosition] = nodes.addRoot()
 
     g = 0
     h = heuristic(startPosition, problem)
     f = g + h
-
-    startNode = (startPosition, None, [], g)        # curPosition, parent's postition, path, cost
-    frontier.push(startNode, f)
+    frontier.push(startPosition, f)
 
     while not frontier.isEmpty():
-        node = frontier.pop()
-        position = node[0]
-        path = node[2]
-        cost = node[3]
-
-        if cost <= seen[position]:
-            if (problem.isGoalState(position)):
-                return path
-
-            successors = problem.getSuccessors(position)
-            for successor in successors:
-                succPosition = successor[0]
-                succDirection = successor[1]
-                succCost = successor[2]
-                if succPosition not in seen or (cost + succCost < seen[succPosition]):
-                    g = cost + succCost
-                    h = heuristic(succPosition, problem)
-                    f = g + h
-                    succNode = (succPosition, position, path + [succDirection], g)
-                    frontier.push(succNode, f)
-                    seen[succPosition] = g
+        position = frontier.pop()
+        nodeIndex = bestNode[position]
+        cost = seen[position]
+
+        if (problem.isGoalState(position)):
+            return nodes.path(nodeIndex)
+
+        successors = problem.getSuccessors(position)
+        for successor in successors:
+            succPosition = successor[0]
+            succDirection = successor[1]
+            succCost = successor[2]
+            if succPosition not in seen or (cost + succCost < seen[succPosition]):
+                g = cost + succCost
+                h = heuristic(succPosition, problem)
+                f = g + h
+                seen[succPosition] = g
+                bestNode[succPosition] = nodes.add(nodeIndex, succDirection)
+                frontier.update(succPosition, f)
     return []
 
 
@@ -28,7 +28,8 @@
 
 import sys
 import inspect
-import heapq, random
+import random
+import collections
 import cStringIO
 
 
@@ -151,11 +152,15 @@ class Stack:
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()     # Newest item on the left, O(1) at both ends
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.appendleft(item)
+
+    def pushMany(self, items):
+        "Enqueue every item of 'items', in order"
+        self.list.extendleft(items)
 
     def pop(self):
         """
@@ -174,37 +179,102 @@ class PriorityQueue:
       has a priority associated with it and the client is usually interested
       in quick retrieval of the lowest-priority item in the queue. This
       data structure allows O(1) access to the lowest-priority item.
+
+      The heap is indexed: every entry remembers its position in the heap and
+      the queue maps each item to its entry, so update() is a true O(log n)
+      decrease-key instead of a scan followed by a heapify.  A lowered entry
+      takes a new count, so among equal priorities it comes out where a
+      freshly pushed duplicate would.
     """
     def  __init__(self):
+        # Entries are [priority, count, item, position]; counts are unique, so
+        # comparing two entries never gets as far as comparing their items
         self.heap = []
+        self.entries = {}               # item -> its most recently pushed entry
         self.count = 0
 
     def push(self, item, priority):
-        entry = (priority, self.count, item)
-        heapq.heappush(self.heap, entry)
+        entry = [priority, self.count, item, len(self.heap)]
+        self.heap.append(entry)
         self.count += 1
+        try:
+            self.entries[item] = entry
+        except TypeError:
+            pass                        # Unhashable items can be pushed, but update() has to scan for them
+        self._siftUp(entry[3])
 
     def pop(self):
-        (_, _, item) = heapq.heappop(self.heap)
+        heap = self.heap
+        entry = heap.pop()
+        if heap:
+            entry, heap[0] = heap[0], entry
+            heap[0][3] = 0
+            self._siftDown(0)
+        item = entry[2]
+        try:
+            if self.entries.get(item) is entry:
+                del self.entries[item]
+        except TypeError:
+            pass
         return item
 
     def isEmpty(self):
         return len(self.heap) == 0
 
     def update(self, item, priority):
-        # If item already in priority queue with higher priority, update its priority and rebuild the heap.
+        # If item already in priority queue with higher priority, lower its priority in place (decrease-key).
         # If item already in priority queue with equal or lower priority, do nothing.
         # If item not in priority queue, do the same thing as self.push.
-        for index, (p, c, i) in enumerate(self.heap):
-            if i == item:
-                if p <= priority:
-                    break
-                del self.heap[index]
-                self.heap.append((priority, c, item))
-                heapq.heapify(self.heap)
-                break
-        else:
+        try:
+            entry = self.entries.get(item)
+        except TypeError:
+            entry = self._find(item)
+        if entry is None:
             self.push(item, priority)
+        elif priority < entry[0]:
+            entry[0], entry[1] = priority, self.count
+            self.count += 1
+            self._siftUp(entry[3])
+
+    def _find(self, item):
+        for entry in self.heap:
+            if entry[2] == item:
+                return entry
+        return None
+
+    def _siftUp(self, position):
+        "Moves the entry at position towards the root until its parent is smaller"
+        heap = self.heap
+        entry = heap[position]
+        while position > 0:
+            parentPosition = (position - 1) >> 1
+            parent = heap[parentPosition]
+            if parent < entry:
+                break
+            heap[position] = parent
+            parent[3] = position
+            position = parentPosition
+        heap[position] = entry
+        entry[3] = position
+
+    def _siftDown(self, position):
+        "Moves the entry at position towards the leaves until both children are larger"
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        child = 2 * position + 1
+        while child < size:
+            right = child + 1
+            if right < size and heap[right] < heap[child]:
+                child = right
+            if entry < heap[child]:
+                break
+            heap[position] = heap[child]
+            heap[position][3] = position
+            position = child
+            child = 2 * position + 1
+        heap[position] = entry
+        entry[3] = position
 
 class PriorityQueueWithFunction(PriorityQueue):
     """
@@ -222,6 +292,37 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class SearchNodes:
+    """
+    A store of search nodes kept as parent pointers.  Each node records only
+    the index of its parent node and the action that led to it, so generating
+    a node is O(1) instead of copying the whole path.  The list of actions is
+    rebuilt once, when the goal node is reached.
+    """
+    def __init__(self):
+        self.parents = []
+        self.actions = []
+
+    def add(self, parent, action):
+        "Adds a node reached from node 'parent' by 'action' and returns its index"
+        self.parents.append(parent)
+        self.actions.append(action)
+        return len(self.parents) - 1
+
+    def addRoot(self):
+        "Adds the start node (no parent, no action) and returns its index"
+        return self.add(None, None)
+
+    def path(self, node):
+        "Returns the list of actions leading from the root to 'node'"
+        parents, actions = self.parents, self.actions
+        path = []
+        while parents[node] is not None:
+            path.append(actions[node])
+            node = parents[node]
+        path.reverse()
+        return path
+
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
@@ -601,20 +702,42 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# A TimeoutFunction call pushes its deadline on a per-thread stack and one
+# watchdog thread, started on first use, polls the stacks.  When a call runs
+# past its deadline the watchdog raises TimeoutExpired asynchronously in its
+# thread, and the call turns it into TimeoutFunctionException.  Nothing
+# happens per call beyond the push and pop (no signals or alarms), and
+# timeouts nest: an inner timeout neither cancels nor extends the ones around
+# it, and TimeoutExpired is not an Exception, so it goes through inner calls
+# and their handlers to the call whose deadline passed.
 #
-import signal
-import time
+# The exception lands when the thread next runs Python code, so a thread
+# blocked in a long C call (a sleep, a read) sees it only once the call
+# returns.  Without ctypes the time is checked after the function returns.
+#
+import time, thread
+try:
+    import ctypes
+    _setAsyncExc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+except (ImportError, AttributeError):
+    _setAsyncExc = None
+
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
 
+class TimeoutExpired(BaseException):
+    """Raised inside a timed function that is out of time; not for catching"""
+    pass
+
 
 class TimeoutFunction:
+    WATCHDOG_INTERVAL = 0.05    # Seconds between the watchdog's checks
+
+    _stacks = {}                # thread id -> [deadline, fired] of its active calls, innermost last
+    _lock = thread.allocate_lock()
+    _watchdog = None
+
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
@@ -623,25 +746,92 @@ class TimeoutFunction:
         raise TimeoutFunctionException()
 
     def __call__(self, *args, **keyArgs):
-        # If we have SIGALRM signal, use it to cause an exception if and
-        # when this function runs too long.  Otherwise check the time taken
-        # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
-            old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
-            try:
-                result = self.function(*args, **keyArgs)
-            finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-        else:
-            startTime = time.time()
+        # A timeout of 0 means none, as it did with signal.alarm
+        if self.timeout <= 0:
+            return self.function(*args, **keyArgs)
+        startTime = time.time()
+        if _setAsyncExc == None:
             result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
-            if timeElapsed >= self.timeout:
+            if time.time() - startTime >= self.timeout:
                 self.handle_timeout(None, None)
+            return result
+
+        if TimeoutFunction._watchdog == None:
+            TimeoutFunction._startWatchdog()
+        threadId = thread.get_ident()
+        stack = TimeoutFunction._stacks.setdefault(threadId, [])
+        entry = [startTime + self.timeout, False]
+        stack.append(entry)
+        try:
+            try:
+                result = self.function(*args, **keyArgs)
+            except TimeoutExpired:
+                if not entry[1]: raise      # An enclosing call's
+        finally:
+            # Taking the entry off under the lock keeps the watchdog from
+            # firing for it afterwards; the loop takes a TimeoutExpired that
+            # arrives meanwhile.  (with releases the lock whatever happens.)
+            late = False
+            while True:
+                try:
+                    with TimeoutFunction._lock:
+                        if stack and stack[-1] is entry:
+                            stack.pop()
+                        else:
+                            TimeoutFunction._unwind(stack, entry)
+                        if entry[1]:
+                            TimeoutFunction._dropPending(threadId, stack)
+                    break
+                except TimeoutExpired:
+                    late = True
+            if late and not entry[1]:
+                raise TimeoutExpired()
+        if entry[1]:
+            # Out of time, possibly with the function having returned anyway
+            self.handle_timeout(None, None)
         return result
 
+    def _unwind(stack, entry):
+        "Takes entry, and any entries left above it, off the stack if it is still there"
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is entry:
+                del stack[i:]
+                return
+    _unwind = staticmethod(_unwind)
+
+    def _dropPending(threadId, stack):
+        "Drops a TimeoutExpired not delivered yet, unless it is for an enclosing call"
+        for deadline, fired in stack:
+            if fired: return
+        _setAsyncExc(ctypes.c_long(threadId), None)
+    _dropPending = staticmethod(_dropPending)
+
+    def _startWatchdog():
+        TimeoutFunction._lock.acquire()
+        if TimeoutFunction._watchdog == None:
+            TimeoutFunction._watchdog = thread.start_new_thread(TimeoutFunction._watch, ())
+        TimeoutFunction._lock.release()
+    _startWatchdog = staticmethod(_startWatchdog)
+
+    def _watch():
+        "The watchdog thread's loop; it only uses locals, so it is safe at interpreter exit"
+        stacks, lock, interval = TimeoutFunction._stacks, TimeoutFunction._lock, TimeoutFunction.WATCHDOG_INTERVAL
+        sleep, clock, setAsyncExc = time.sleep, time.time, _setAsyncExc
+        c_long, exception = ctypes.c_long, ctypes.py_object(TimeoutExpired)
+        while True:
+            sleep(interval)
+            now = clock()
+            lock.acquire()
+            for threadId, stack in stacks.items():
+                # The outermost call out of time is the one to stop
+                for entry in stack:
+                    if entry[0] <= now:
+                        if not entry[1]:
+                            entry[1] = True
+                            setAsyncExc(c_long(threadId), exception)
+                        break
+            lock.release()
+    _watch = staticmethod(_watch)
 
 
 _ORIGINAL_STDOUT = None
@@ -0,0 +1,566 @@
+# benchmark.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Timing harness for the game engine and the multi-agent searches.  Each
+benchmark prints a small table; run one or more of them by name:
+
+> python benchmark.py successors
+
+Run with no arguments to list the available benchmarks.
+"""
+
+import sys, time, random, gc, types, signal, cPickle
+import game, layout, pacman, multiAgents, pacmanAgents, ghostAgents, textDisplay, util
+
+def sampleStates(layoutName, numStates=20, seed=0, numGhosts=1000):
+    """
+    Returns numStates GameStates of a game on layoutName (with at most
+    numGhosts ghosts) in which every agent moves at random (with a fixed
+    seed), so the samples include eaten food, scared ghosts and so on.  Only
+    states where Pacman is to move are kept.
+    """
+    rng = random.Random(seed)
+    state = pacman.GameState()
+    state.initialize(layout.getLayout(layoutName), numGhosts)
+    states = []
+    while len(states) < numStates:
+        if state.isWin() or state.isLose():
+            state = states[0]
+        states.append(state)
+        for agentIndex in range(state.getNumAgents()):
+            if state.isWin() or state.isLose(): break
+            state = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+    return states
+
+def expand(state, agentIndex, depth):
+    "Generates the whole game tree under state to the given ply; returns the number of states"
+    if depth == 0 or state.isWin() or state.isLose():
+        return 0
+    nextAgent = (agentIndex + 1) % state.getNumAgents()
+    count = 0
+    for action in state.getLegalActions(agentIndex):
+        count += 1 + expand(state.generateSuccessor(agentIndex, action), nextAgent, depth - 1)
+    return count
+
+def benchmarkSuccessors(layoutNames=('mediumClassic', 'originalClassic'), depth=6):
+    """
+    GameState.generateSuccessor throughput: the full game tree to a fixed ply
+    under sampled states, in generated states per second, with explored-state
+    tracking off and on, and the size of the explored record of one pass.
+    """
+    print '%-16s %10s %12s %12s %10s %10s' % ('layout', 'states', 'states/s', 'tracked/s', 'explored', 'KB')
+    for name in layoutNames:
+        states = sampleStates(name)
+        row = []
+        for tracking in [False, True]:
+            pacman.GameState.setExploredTracking(tracking)
+            runs, count, start = 0, 0, time.time()
+            while runs == 0 or time.time() - start < 1.0:
+                pacman.GameState.getAndResetExplored()
+                count += sum([expand(state, 0, depth) for state in states])
+                runs += 1
+            row.append(count / (time.time() - start))
+        explored, size = pacman.GameState.getExploredStats()
+        pacman.GameState.setExploredTracking(False)
+        print '%-16s %10d %12.0f %12.0f %10d %10.0f' % (name, count / runs, row[0], row[1], explored, size / 1024.0)
+
+def withReplaced(replacements, function):
+    """
+    Calls function() with each (object, name, value) of replacements set as
+    an attribute, then puts the old attributes back; returns its result.
+    """
+    old = [(obj, name, vars(obj)[name]) for obj, name, value in replacements]
+    try:
+        for obj, name, value in replacements:
+            setattr(obj, name, value)
+        return function()
+    finally:
+        for obj, name, value in old:
+            setattr(obj, name, value)
+
+def reachable(roots, seen):
+    """
+    Walks the objects reachable from roots that are not in seen (a set of
+    ids), adding them to seen, and returns them.  Classes, modules and
+    functions are not walked into.
+    """
+    found, stack = [], list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen: continue
+        if isinstance(obj, (type, types.ClassType, types.ModuleType, types.FunctionType)): continue
+        seen.add(id(obj))
+        found.append(obj)
+        stack.extend(gc.get_referents(obj))
+    return found
+
+def unslotted(cls):
+    "A copy of the slotted class cls whose instances keep their attributes in a dict, as before __slots__"
+    namespace = dict([(key, value) for key, value in vars(cls).items()
+                      if key != '__slots__' and key not in cls.__slots__])
+    return type(cls.__name__, cls.__bases__, namespace)
+
+DictConfiguration = unslotted(game.Configuration)
+DictGameStateData = unslotted(game.GameStateData)
+
+def uninternedConfiguration(pos, direction):
+    return DictConfiguration(pos, direction)
+
+def uncachedDirectionToVector(direction, speed = 1.0):
+    dx, dy = game.Actions._directions[direction]
+    return (dx * speed, dy * speed)
+
+UNSLOTTED_STATES = [(game, 'internConfiguration', uninternedConfiguration),
+                    (pacman, 'internConfiguration', uninternedConfiguration),
+                    (game.Actions, 'directionToVector', staticmethod(uncachedDirectionToVector)),
+                    (game, 'AgentState', unslotted(game.AgentState)),
+                    (game, 'GameStateData', DictGameStateData),
+                    (pacman, 'GameStateData', DictGameStateData),
+                    (pacman, 'GameState', unslotted(pacman.GameState))]
+
+def countAllocations(name, numGhosts):
+    """
+    Returns (successors, objects, bytes) allocated by generateSuccessor
+    over one round of moves under states sampled on layout name
+    """
+    # Caches in game.py (module or class level) hold objects shared by all states
+    cacheRoots = [vars(game)] + [vars(c) for c in vars(game).values() if isinstance(c, (type, types.ClassType))]
+    states = sampleStates(name, numGhosts=numGhosts)
+    for state in states:                # Warm up the caches
+        expand(state, 0, numGhosts + 1)
+    successors, objects, size = 0, 0, 0
+    for state in states:
+        parents = [state]
+        for agentIndex in range(numGhosts + 1):
+            children = []
+            for parent in parents:
+                if parent.isWin() or parent.isLose(): continue
+                for action in parent.getLegalActions(agentIndex):
+                    child = parent.generateSuccessor(agentIndex, action)
+                    seen = set()
+                    reachable([parent] + cacheRoots, seen)
+                    new = reachable([child], seen)
+                    successors += 1
+                    objects += len(new)
+                    size += sum([sys.getsizeof(obj) for obj in new])
+                    children.append(child)
+            parents = children
+    return successors, objects, size
+
+def benchmarkAllocations(layouts=(('mediumClassic', 2), ('originalClassic', 3))):
+    """
+    Objects and bytes (sys.getsizeof) newly allocated per generateSuccessor
+    call: those reachable from the successor but not from its parent or
+    from the caches in game.py, over one round of moves under sampled
+    states.  "before" uses state classes with instance dicts and fresh
+    Configurations and direction vectors, as before __slots__ and interning.
+    """
+    print '%-16s %7s %-8s %12s %10s %12s' % ('layout', 'ghosts', 'states', 'successors', 'objects', 'bytes')
+    for name, numGhosts in layouts:
+        for mode, replacements in [('before', UNSLOTTED_STATES), ('after', [])]:
+            successors, objects, size = withReplaced(replacements, lambda: countAllocations(name, numGhosts))
+            print '%-16s %7d %-8s %12d %10.1f %12.0f' % (name, numGhosts, mode, successors,
+                                                        float(objects) / successors, float(size) / successors)
+
+def benchmarkAgents(layoutNames=('mediumClassic',), agents=('MinimaxAgent', 'AlphaBetaAgent', 'ExpectimaxAgent'), depth='3'):
+    """
+    Seconds per getAction call of the multi-agent searches on sampled states.
+    """
+    print '%-16s %-18s %10s' % ('layout', 'agent', 's/move')
+    for name in layoutNames:
+        states = sampleStates(name)
+        for agentName in agents:
+            agent = getattr(multiAgents, agentName)(depth=depth)
+            start = time.time()
+            for state in states:
+                agent.getAction(state)
+            print '%-16s %-18s %10.4f' % (name, agentName, (time.time() - start) / len(states))
+
+def benchmarkTranspositions(layoutNames=('mediumClassic',), agents=('MinimaxAgent', 'AlphaBetaAgent', 'ExpectimaxAgent'),
+                            depth='3', megabytes=('0', '1', '16')):
+    """
+    The searches with no transposition table and with tables of a few sizes
+    (tt=MB): seconds per move, evaluation function calls per move and the
+    table hit rate.  The moves chosen must be the same with and without a
+    table.
+    """
+    print '%-16s %-18s %6s %10s %10s %8s %8s' % ('layout', 'agent', 'MB', 's/move', 'evals', 'hits', 'full')
+    for name in layoutNames:
+        states = sampleStates(name)
+        for agentName in agents:
+            baseline = None
+            for size in megabytes:
+                agent = getattr(multiAgents, agentName)(depth=depth, tt=size)
+                evaluate, evals = agent.evaluationFunction, [0]
+                def countingEvaluation(state):
+                    evals[0] += 1
+                    return evaluate(state)
+                agent.evaluationFunction = countingEvaluation
+                probes = hits = 0
+                actions, start = [], time.time()
+                for state in states:
+                    actions.append(agent.getAction(state))
+                    stats = agent.searchStats.get('tt', {})
+                    probes += stats.get('probes', 0)
+                    hits += stats.get('hits', 0)
+                seconds = time.time() - start
+                if baseline == None:
+                    baseline = actions
+                elif actions != baseline:
+                    raise Exception('%s with tt=%s chose different moves on %s' % (agentName, size, name))
+                table = agent.transpositions
+                full = table and float(table.used) / table.size or 0
+                print '%-16s %-18s %6s %10.4f %10d %8.3f %8.3f' % (name, agentName, size, seconds / len(states),
+                                                                 evals[0] / len(states), float(hits) / max(1, probes), full)
+
+def benchmarkDeepening(layoutNames=('smallClassic', 'mediumClassic', 'originalClassic'), agents=('AlphaBetaAgent', 'ExpectimaxAgent'),
+                       budget='0.2'):
+    """
+    Iterative deepening with a per-move budget (budget=S) against the
+    fixed-depth search it replaces (depth=2, the default): the mean and
+    least depth finished per move, and the mean and longest move time.  With
+    a budget the time should overrun it by no more than one node.
+    """
+    print '%-16s %-18s %-12s %8s %8s %10s %10s' % ('layout', 'agent', 'mode', 'depth', 'min', 's/move', 'max s')
+    for name in layoutNames:
+        states = sampleStates(name, numStates=10)
+        for agentName in agents:
+            for mode, args in [('depth=2', {'depth': '2'}), ('budget=' + budget, {'budget': budget})]:
+                agent = getattr(multiAgents, agentName)(**args)
+                depths, times = [], []
+                for state in states:
+                    start = time.time()
+                    agent.getAction(state)
+                    times.append(time.time() - start)
+                    depths.append(agent.searchStats.get('deepening', {'depth': agent.depth})['depth'])
+                print '%-16s %-18s %-12s %8.2f %8d %10.4f %10.4f' % (name, agentName, mode, float(sum(depths)) / len(depths),
+                                                                    min(depths), sum(times) / len(times), max(times))
+
+def branchingFactor(nodes, plies):
+    "The b for which a uniform tree of the given plies has nodes nodes: nodes = 1 + b + ... + b^plies"
+    low, high = 1.0, float(nodes)
+    for i in range(100):
+        b = (low + high) / 2
+        if sum([b ** ply for ply in range(plies + 1)]) > nodes:
+            high = b
+        else:
+            low = b
+    return low
+
+def benchmarkOrdering(layoutNames=('smallClassic', 'mediumClassic', 'originalClassic'), depths=(2, 3, 4),
+                      orderings=('none', 'pv', 'killer', 'history', 'static', 'all'), numStates=5):
+    """
+    AlphaBetaAgent with each move ordering (ordering=...): nodes searched
+    per move and the effective branching factor over depth * agents plies,
+    and the nodes and time as a multiple of the first ordering's.  The first,
+    none, is the search as it was before move ordering (legal actions in
+    wall order).  The root values must not change with the ordering.
+    """
+    print '%-16s %5s %-8s %10s %8s %10s %8s %8s' % ('layout', 'depth', 'ordering', 'nodes', 'ebf', 's/move',
+                                                  'x nodes', 'x time')
+    for name in layoutNames:
+        states = sampleStates(name, numStates=numStates)
+        for depth in depths:
+            baseline = None
+            for ordering in orderings:
+                agent = multiAgents.AlphaBetaAgent(depth=str(depth), ordering=ordering)
+                nodes, values, start = 0, [], time.time()
+                for state in states:
+                    agent.getAction(state)
+                    nodes += agent.searchStats['search']['nodes']
+                    values.append(max(agent.rootValues.values()))
+                seconds = time.time() - start
+                if baseline == None:
+                    baseline, baseNodes, baseSeconds = values, nodes, seconds
+                elif values != baseline:
+                    raise Exception('ordering=%s changed the root values on %s' % (ordering, name))
+                plies = depth * states[0].getNumAgents()
+                print '%-16s %5d %-8s %10d %8.3f %10.4f %8.2f %8.2f' % (name, depth, ordering, nodes / len(states),
+                                                                       branchingFactor(float(nodes) / len(states), plies),
+                                                                       seconds / len(states), float(nodes) / baseNodes,
+                                                                       seconds / baseSeconds)
+
+def benchmarkParallel(layoutNames=('mediumClassic', 'originalClassic'), agents=('MinimaxAgent', 'AlphaBetaAgent', 'ExpectimaxAgent'),
+                      depth='3', workerCounts=(2, 4, 8), numStates=5):
+    """
+    Root splitting (workers=N): seconds per move of the serial search and
+    the speedup with N worker processes.  The moves chosen must be the
+    same.  The pool is started before timing.
+    """
+    print '%-16s %-18s %10s' % ('layout', 'agent', 'serial') + ''.join(['%10s' % ('x%d' % n) for n in workerCounts])
+    for name in layoutNames:
+        states = sampleStates(name, numStates=numStates)
+        for agentName in agents:
+            row, baseline, serial = '%-16s %-18s' % (name, agentName), None, None
+            for workers in (0,) + tuple(workerCounts):
+                agent = getattr(multiAgents, agentName)(depth=depth, workers=str(workers))
+                agent.getAction(states[0])
+                start = time.time()
+                actions = [agent.getAction(state) for state in states]
+                seconds = (time.time() - start) / len(states)
+                if agent.splitter != None:
+                    agent.splitter.close()
+                if baseline == None:
+                    baseline, serial = actions, seconds
+                    row += '%10.4f' % seconds
+                else:
+                    if actions != baseline:
+                        raise Exception('%s with workers=%d chose different moves on %s' % (agentName, workers, name))
+                    row += '%10.2f' % (serial / seconds)
+            print row
+
+def timeCalled(function, timings):
+    "Wraps function to append the seconds each call takes to timings"
+    def timed(*args):
+        start = time.time()
+        result = function(*args)
+        timings.append(time.time() - start)
+        return result
+    return timed
+
+def benchmarkMCTS(layoutNames=('smallClassic',), numGames=5,
+                  agents=(('ExpectimaxAgent', 'depth=1'), ('ExpectimaxAgent', 'depth=2'), ('ExpectimaxAgent', 'depth=3'),
+                          ('MCTSAgent', 'iterations=25'), ('MCTSAgent', 'iterations=50'), ('MCTSAgent', 'iterations=100'))):
+    """
+    Win rate against seconds per move: MCTSAgent with a few iteration
+    budgets and ExpectimaxAgent at a few depths, over the same numGames
+    seeded games against RandomGhosts.
+    """
+    print '%-16s %-16s %-16s %10s %8s %10s' % ('layout', 'agent', 'options', 's/move', 'wins', 'score')
+    for name in layoutNames:
+        lay = layout.getLayout(name)
+        for agentName, options in agents:
+            wins, scores, timings = 0, [], []
+            for i in range(numGames):
+                random.seed(i)
+                agent = getattr(multiAgents, agentName)(**pacman.parseAgentArgs(options))
+                agent.getAction = timeCalled(agent.getAction, timings)
+                ghosts = [ghostAgents.RandomGhost(g + 1) for g in range(lay.getNumGhosts())]
+                game = pacman.ClassicGameRules().newGame(lay, agent, ghosts, textDisplay.NullGraphics(), quiet=True)
+                game.run()
+                wins += game.state.isWin()
+                scores.append(game.state.getScore())
+            print '%-16s %-16s %-16s %10.4f %8s %10.1f' % (name, agentName, options, sum(timings) / len(timings),
+                                                         '%d/%d' % (wins, numGames), sum(scores) / len(scores))
+
+sharedLayoutDeepCopy = game.GameStateData.deepCopy
+
+def reparsingDeepCopy(self):
+    "GameStateData.deepCopy as it was before layouts were shared: the layout text is parsed again"
+    state = sharedLayoutDeepCopy(self)
+    state.layout = layout.Layout(self.layout.layoutText[:])
+    state.layout.actionTables = self.layout.actionTables
+    return state
+
+def timeGames(lay, minTime):
+    "Returns (games, turns, turns per second) of GreedyAgent against RandomGhosts on lay"
+    random.seed(0)
+    games, turns, start = 0, 0, time.time()
+    while games == 0 or time.time() - start < minTime:
+        ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+        rules = pacman.ClassicGameRules()
+        game = rules.newGame(lay, pacmanAgents.GreedyAgent(), ghosts, textDisplay.NullGraphics(), quiet=True)
+        game.run()
+        games += 1
+        turns += len(game.moveHistory)
+    return games, turns, turns / (time.time() - start)
+
+def benchmarkGames(layoutNames=('mediumClassic',), minTime=2.0):
+    """
+    Game.run turns per second: GreedyAgent against RandomGhosts with no
+    display, so the time is the game loop itself (observation snapshots,
+    successor generation and the rules).  "before" copies the layout with
+    every observation, as GameStateData.deepCopy did before layouts were
+    shared.
+    """
+    print '%-16s %-8s %8s %10s %12s' % ('layout', 'layouts', 'games', 'turns', 'turns/s')
+    for name in layoutNames:
+        lay = layout.getLayout(name)
+        for mode, replacements in [('before', [(game.GameStateData, 'deepCopy', reparsingDeepCopy)]),
+                                   ('after', [])]:
+            games, turns, rate = withReplaced(replacements, lambda: timeGames(lay, minTime))
+            print '%-16s %-8s %8d %10d %12.0f' % (name, mode, games, turns, rate)
+
+class RandomPacman(game.Agent):
+    "A Pacman that picks among its legal actions with random.choice"
+    def getAction(self, state):
+        return random.choice(state.getLegalPacmanActions())
+
+def benchmarkReplay(recordings=(('recordings/smallClassic-reflex', -446),)):
+    """
+    Loads and replays games recorded (with -r) before Grid was a bitboard;
+    each must replay to the score it was recorded with.
+    """
+    print '%-24s %8s %10s %10s' % ('recording', 'score', 'load', 'replay')
+    for fileName, score in recordings:
+        start = time.time()
+        f = open(fileName)
+        try: recorded = cPickle.load(f)
+        finally: f.close()
+        loaded = time.time()
+        state = pacman.replayGame(recorded['layout'], recorded['actions'], textDisplay.NullGraphics())
+        if state.getScore() != score:
+            raise Exception('%s replays to score %d, not %d' % (fileName, state.getScore(), score))
+        print '%-24s %8d %10.4f %10.4f' % (fileName[len('recordings/'):], score, loaded - start, time.time() - loaded)
+
+def benchmarkSimulator(layoutNames=('smallClassic', 'mediumClassic'), numChecked=20, batchSize=1000):
+    """
+    gameBatch.GameBatch against Game.run: first checks that numChecked
+    seeded games come out move for move the same, then compares games per
+    second, for LeftTurnAgent and a random Pacman against RandomGhosts and
+    DirectionalGhosts.  Needs NumPy.
+    """
+    try:
+        import gameBatch
+    except ImportError:
+        print 'The simulator needs NumPy, which is not installed'
+        return
+    pacmen = [('leftTurn', gameBatch.leftTurnPolicy, pacmanAgents.LeftTurnAgent),
+              ('random', gameBatch.randomPolicy, RandomPacman)]
+    ghostTypes = [ghostAgents.RandomGhost, ghostAgents.DirectionalGhost]
+    print '%-16s %-10s %-18s %10s %10s %10s' % ('layout', 'pacman', 'ghosts', 'mean', 'run/s', 'batch/s')
+    for name in layoutNames:
+        lay = layout.getLayout(name)
+        for pacmanName, policy, agentType in pacmen:
+            for ghostType in ghostTypes:
+                def runGame(seed):
+                    random.seed(seed)
+                    ghosts = [ghostType(i + 1) for i in range(lay.getNumGhosts())]
+                    theGame = pacman.ClassicGameRules().newGame(lay, agentType(), ghosts, textDisplay.NullGraphics(), quiet=True)
+                    theGame.run()
+                    return theGame
+                batch = gameBatch.GameBatch(lay, range(numChecked), policy, ghostType, recordMoves=True)
+                batch.run()
+                start = time.time()
+                for seed in range(numChecked):
+                    theGame = runGame(seed)
+                    if (theGame.state.getScore(), theGame.state.isWin(), theGame.moveHistory) != \
+                       (float(batch.score[seed]), batch.win[seed], batch.getMoveHistory(seed)):
+                        raise Exception('GameBatch differs from Game.run on %s with seed %d' % (name, seed))
+                runRate = numChecked / (time.time() - start)
+                start = time.time()
+                scores = gameBatch.GameBatch(lay, range(batchSize), policy, ghostType).run()
+                batchRate = batchSize / (time.time() - start)
+                print '%-16s %-10s %-18s %10.1f %10.0f %10.0f' % (name, pacmanName, ghostType.__name__,
+                                                                 scores.mean(), runRate, batchRate)
+
+def timeCalls(function, minTime=0.2):
+    "Calls function() until minTime seconds have passed; returns seconds per call"
+    calls, start = 0, time.time()
+    while calls == 0 or time.time() - start < minTime:
+        function()
+        calls += 1
+    return (time.time() - start) / calls
+
+class LegacyTimeoutFunction:
+    "The old SIGALRM TimeoutFunction: two signal() and two alarm() calls per call, not reentrant"
+    def __init__(self, function, timeout):
+        self.timeout = timeout
+        self.function = function
+
+    def handle_timeout(self, signum, frame):
+        raise util.TimeoutFunctionException()
+
+    def __call__(self, *args, **keyArgs):
+        old = signal.signal(signal.SIGALRM, self.handle_timeout)
+        signal.alarm(self.timeout)
+        try:
+            result = self.function(*args, **keyArgs)
+        finally:
+            signal.signal(signal.SIGALRM, old)
+        signal.alarm(0)
+        return result
+
+def spin(seconds):
+    "Busy-waits for seconds"
+    end = time.time() + seconds
+    while time.time() < end: pass
+
+def catchTimeouts(seconds, inner):
+    "Calls spin(inner) under a 5 second timeout over and over, ignoring timeouts"
+    end = time.time() + seconds
+    while time.time() < end:
+        try:
+            util.TimeoutFunction(spin, 5)(inner)
+        except util.TimeoutFunctionException:
+            pass
+
+def benchmarkTimeouts(layoutNames=('mediumClassic',), minTime=2.0):
+    """
+    util.TimeoutFunction against the old SIGALRM version: first checks that
+    nested timeouts fire, then times calls of a trivial function and
+    Game.run turns per second (GreedyAgent against RandomGhosts, no
+    display) without -c and with -c under each version.
+    """
+    start = time.time()
+    try:
+        util.TimeoutFunction(catchTimeouts, 1)(3, 0.2)
+        raise Exception('The enclosing timeout did not fire')
+    except util.TimeoutFunctionException:
+        if not 1 <= time.time() - start < 1.5:
+            raise Exception('The enclosing timeout fired after %.2f seconds' % (time.time() - start))
+
+    print '%-16s %12s' % ('timeout', 'us/call')
+    for name, timeoutClass in [('legacy', LegacyTimeoutFunction), ('watchdog', util.TimeoutFunction)]:
+        function = timeoutClass(len, 30)
+        seconds = timeCalls(lambda: [function('') for i in xrange(1000)], minTime=1.0) / 1000
+        print '%-16s %12.2f' % (name, 1e6 * seconds)
+
+    print '\n%-16s %-10s %12s' % ('layout', 'timeouts', 'turns/s')
+    for name in layoutNames:
+        lay = layout.getLayout(name)
+        for timeoutName, timeoutClass, catchExceptions in [('none', None, False),
+                                                          ('legacy', LegacyTimeoutFunction, True),
+                                                          ('watchdog', util.TimeoutFunction, True)]:
+            game.TimeoutFunction = timeoutClass or util.TimeoutFunction
+            random.seed(0)
+            games, turns, start = 0, 0, time.time()
+            while games == 0 or time.time() - start < minTime:
+                ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+                theGame = pacman.ClassicGameRules().newGame(lay, pacmanAgents.GreedyAgent(), ghosts,
+                                                            textDisplay.NullGraphics(), True, catchExceptions)
+                theGame.run()
+                games += 1
+                turns += len(theGame.moveHistory)
+            print '%-16s %-10s %12.0f' % (name, timeoutName, turns / (time.time() - start))
+        game.TimeoutFunction = util.TimeoutFunction
+
+BENCHMARKS = {
+    'agents': benchmarkAgents,
+    'allocations': benchmarkAllocations,
+    'deepening': benchmarkDeepening,
+    'games': benchmarkGames,
+    'mcts': benchmarkMCTS,
+    'ordering': benchmarkOrdering,
+    'parallel': benchmarkParallel,
+    'replay': benchmarkReplay,
+    'simulator': benchmarkSimulator,
+    'timeouts': benchmarkTimeouts,
+    'transpositions': benchmarkTranspositions,
+    'successors': benchmarkSuccessors,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    if not names:
+        print 'Usage: python benchmark.py <name> [<name> ...]'
+        for name in sorted(BENCHMARKS):
+            print '  %-12s %s' % (name, BENCHMARKS[name].__doc__.strip().split('\n')[0])
+        sys.exit(1)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise Exception('Unknown benchmark: ' + name)
+        print '*** %s' % name
+        BENCHMARKS[name]()
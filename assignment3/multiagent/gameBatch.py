@@ -0,0 +1,361 @@
+# gameBatch.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A NumPy simulator that plays many classic Pacman games on one layout in
+lockstep, for Monte Carlo evaluation of simple Pacman policies against
+RandomGhosts or DirectionalGhosts.  Positions, scared timers, food,
+capsules and scores are arrays with one row per game, and each move is
+applied to every running game at once with the PacmanRules and GhostRules
+of pacman.py.
+
+Every game has its own random stream, seeded as random.seed(seed) seeds
+Python's, and draws from it exactly where the agents and
+util.chooseFromDistribution draw, so game i of a batch is the game
+Game.run plays after random.seed(seeds[i]), move for move.  benchmark.py
+simulator checks this.
+
+This module needs NumPy; the rest of the project does not.
+"""
+
+import numpy
+import util, pacman, ghostAgents
+from game import Actions, Directions
+
+# Actions are numbered in Actions.getPossibleActions order, so legal action
+# lists come out in the same order as the engine's.
+ACTIONS = [direction for direction, vector in Actions._directionsAsList]
+STOP = ACTIONS.index(Directions.STOP)
+VECTOR_X = numpy.array([Actions._directions[a][0] for a in ACTIONS])
+VECTOR_Y = numpy.array([Actions._directions[a][1] for a in ACTIONS])
+LEFT = numpy.array([ACTIONS.index(Directions.LEFT[a]) for a in ACTIONS])
+RIGHT = numpy.array([ACTIONS.index(Directions.RIGHT[a]) for a in ACTIONS])
+NUM_MASKS = 1 << len(ACTIONS)
+
+def actionMask(actions):
+    "The bitmask of a list of actions, bit i standing for ACTIONS[i]"
+    mask = 0
+    for action in actions:
+        mask |= 1 << ACTIONS.index(action)
+    return mask
+
+def maskActions(mask):
+    "The actions of a bitmask, in ACTIONS order"
+    return [a for i, a in enumerate(ACTIONS) if mask >> i & 1]
+
+def seedKey(seed):
+    "The key random.seed(seed) hands to the Mersenne Twister: abs(seed) in 32-bit words"
+    seed, key = abs(seed), []
+    while seed or not key:
+        key.append(seed & 0xffffffff)
+        seed >>= 32
+    return key
+
+def sampleTotals(distribution):
+    """
+    Mirrors util.sample on a Counter: returns the actions in the order it
+    walks them and the running totals it compares random.random() with.
+    """
+    items = sorted(distribution.items())
+    probabilities = [p for a, p in items]
+    if sum(probabilities) != 1:
+        probabilities = util.normalize(probabilities)
+    totals, total = [], 0.0
+    for i, p in enumerate(probabilities):
+        total = p if i == 0 else total + p
+        totals.append(total)
+    return [a for a, p in items], totals
+
+def randomGhostDistribution(legalActions):
+    "RandomGhost.getDistribution for the given legal actions"
+    dist = util.Counter()
+    for a in legalActions: dist[a] = 1.0
+    dist.normalize()
+    return dist
+
+def directionalGhostDistribution(legalActions, bestActions, bestProb):
+    "DirectionalGhost.getDistribution once it has found the best actions"
+    dist = util.Counter()
+    for a in bestActions: dist[a] = bestProb / len(bestActions)
+    for a in legalActions: dist[a] += ( 1-bestProb ) / len(legalActions)
+    dist.normalize()
+    return dist
+
+class SampleTable:
+    """
+    The distributions a ghost can draw its move from, as arrays indexed by
+    a distribution key: the actions in sampling order, the running totals
+    (padded with infinity) and the number of actions.
+    """
+    def __init__(self, numKeys):
+        self.actions = numpy.zeros((numKeys, len(ACTIONS)), int)
+        self.totals = numpy.empty((numKeys, len(ACTIONS)))
+        self.totals.fill(numpy.inf)
+        self.sizes = numpy.ones(numKeys, int)
+
+    def add(self, key, distribution):
+        actions, totals = sampleTotals(distribution)
+        self.actions[key, :len(actions)] = [ACTIONS.index(a) for a in actions]
+        self.totals[key, :len(totals)] = totals
+        self.sizes[key] = len(actions)
+
+    def sample(self, keys, choices):
+        "The actions util.sample picks for the random.random() draws choices"
+        walked = (choices[:, None] > self.totals[keys]).sum(1)
+        return self.actions[keys, numpy.minimum(walked, self.sizes[keys] - 1)]
+
+def leftTurnPolicy(batch, games):
+    "LeftTurnAgent: turn left, else go straight, else right, else back"
+    current = batch.pacmanDirection[games]
+    current[current == STOP] = ACTIONS.index(Directions.NORTH)
+    legal = batch.pacmanLegalMask[batch.pacmanCell[games]]
+    left = LEFT[current]
+    actions = numpy.empty(len(games), int)
+    actions.fill(STOP)
+    for choice in [LEFT[left], RIGHT[current], current, left]:
+        allowed = legal >> choice & 1 == 1
+        actions[allowed] = choice[allowed]
+    return actions
+
+def randomPolicy(batch, games):
+    "random.choice over Pacman's legal actions, STOP included"
+    cells = batch.pacmanCell[games]
+    picks = (batch.draw(games) * batch.pacmanLegalCount[cells]).astype(int)
+    return batch.pacmanLegalList[cells, picks]
+
+class GameBatch:
+    """
+    numGames = len(seeds) classic games on one layout, Pacman following a
+    vectorized policy (a function of the batch and the indices of the
+    running games that returns their actions, like leftTurnPolicy) against
+    ghosts of ghostType, RandomGhost or DirectionalGhost.
+
+    Ghost coordinates are stored doubled, so the half cells of scared ghosts
+    are integers too.
+    """
+    BUFFER = 256    # random.random() draws generated per game at a time
+
+    def __init__(self, layout, seeds, pacmanPolicy=leftTurnPolicy, ghostType=ghostAgents.RandomGhost,
+                 numGhosts=4, probAttack=0.8, probScaredFlee=0.8, recordMoves=False):
+        start = pacman.GameState()
+        start.initialize(layout, numGhosts)
+        agentStates = start.data.agentStates
+        self.numGames = numGames = len(seeds)
+        self.numGhosts = len(agentStates) - 1
+        self.pacmanPolicy = pacmanPolicy
+        self.directional = ghostType == ghostAgents.DirectionalGhost
+        if not self.directional and ghostType != ghostAgents.RandomGhost:
+            raise Exception('GameBatch simulates RandomGhost and DirectionalGhost, not ' + ghostType.__name__)
+
+        # The board: open cells, their legal actions and neighbours
+        walls = layout.walls
+        self.cells = cells = walls.asList(False)
+        self.cellX = numpy.array([x for x, y in cells])
+        self.cellY = numpy.array([y for x, y in cells])
+        self.cellIndex = numpy.zeros((walls.width, walls.height), int)
+        self.cellIndex.fill(-1)
+        for i, (x, y) in enumerate(cells):
+            self.cellIndex[x, y] = i
+        pacmanTable = pacman.PacmanRules.getActionTable(layout)
+        ghostTable = pacman.GhostRules.getActionTable(layout)
+        self.pacmanLegalMask = numpy.array([actionMask(pacmanTable[cell]) for cell in cells])
+        self.pacmanLegalCount = numpy.array([len(pacmanTable[cell]) for cell in cells])
+        self.pacmanLegalList = numpy.zeros((len(cells), len(ACTIONS)), int)
+        self.nextCell = numpy.zeros((len(cells), len(ACTIONS)), int)
+        self.nextCell.fill(-1)
+        self.ghostLegalMask = numpy.zeros((len(cells), len(ACTIONS)), int)
+        for i, (x, y) in enumerate(cells):
+            for j, action in enumerate(pacmanTable[(x, y)]):
+                a = ACTIONS.index(action)
+                self.pacmanLegalList[i, j] = a
+                self.nextCell[i, a] = self.cellIndex[x + VECTOR_X[a], y + VECTOR_Y[a]]
+            for a, heading in enumerate(ACTIONS):
+                self.ghostLegalMask[i, a] = actionMask(ghostTable[(x, y)][heading])
+        self.capsuleAt = numpy.zeros(len(cells), int)
+        self.capsuleAt.fill(-1)
+        for i, capsule in enumerate(layout.capsules):
+            self.capsuleAt[self.cellIndex[capsule]] = i
+
+        # The ghosts' move distributions
+        if self.directional:
+            self.samples = SampleTable(2 * NUM_MASKS * NUM_MASKS)
+            for legal in range(1, NUM_MASKS):
+                for best in range(1, NUM_MASKS):
+                    if best & ~legal: continue
+                    for scared, bestProb in enumerate([probAttack, probScaredFlee]):
+                        distribution = directionalGhostDistribution(maskActions(legal), maskActions(best), bestProb)
+                        self.samples.add((scared * NUM_MASKS + legal) * NUM_MASKS + best, distribution)
+        else:
+            self.samples = SampleTable(NUM_MASKS)
+            for legal in range(1, NUM_MASKS):
+                self.samples.add(legal, randomGhostDistribution(maskActions(legal)))
+
+        # The games
+        pacmanStart = agentStates[0].getPosition()
+        self.ghostStartX2 = numpy.array([2 * int(s.getPosition()[0]) for s in agentStates[1:]], int)
+        self.ghostStartY2 = numpy.array([2 * int(s.getPosition()[1]) for s in agentStates[1:]], int)
+        self.pacmanCell = numpy.zeros(numGames, int) + self.cellIndex[pacmanStart]
+        self.pacmanDirection = numpy.zeros(numGames, int) + STOP
+        self.ghostX2 = numpy.tile(self.ghostStartX2, (numGames, 1))
+        self.ghostY2 = numpy.tile(self.ghostStartY2, (numGames, 1))
+        self.ghostDirection = numpy.zeros((numGames, self.numGhosts), int) + STOP
+        self.scaredTimer = numpy.zeros((numGames, self.numGhosts), int)
+        self.food = numpy.tile(numpy.array([layout.food[x][y] for x, y in cells], bool), (numGames, 1))
+        self.numFood = self.food.sum(1)
+        self.capsules = numpy.ones((numGames, len(layout.capsules)), bool)
+        self.score = numpy.zeros(numGames, int)
+        self.win = numpy.zeros(numGames, bool)
+        self.lose = numpy.zeros(numGames, bool)
+        self.numMoves = numpy.zeros(numGames, int)
+
+        # Each game's random stream
+        self.streams = [numpy.random.RandomState(seedKey(seed)) for seed in seeds]
+        self.randoms = numpy.array([stream.random_sample(self.BUFFER) for stream in self.streams])
+        self.drawn = numpy.zeros(numGames, int)
+        self.moves = None   # (agentIndex, games, actions) per step, if recordMoves
+        if recordMoves: self.moves = []
+
+    def draw(self, games):
+        "The next random.random() of each of the games"
+        for game in games[self.drawn[games] == self.BUFFER]:
+            self.randoms[game] = self.streams[game].random_sample(self.BUFFER)
+            self.drawn[game] = 0
+        choices = self.randoms[games, self.drawn[games]]
+        self.drawn[games] += 1
+        return choices
+
+    def isOver(self):
+        return self.win | self.lose
+
+    def run(self, maxMoves=None):
+        """
+        Plays every game to its end, or until it has made maxMoves moves
+        (counting every agent's).  Returns the final scores.
+        """
+        agentIndex = 0
+        while True:
+            running = ~self.isOver()
+            if maxMoves != None: running &= self.numMoves < maxMoves
+            games = numpy.flatnonzero(running)
+            if len(games) == 0: break
+            if agentIndex == 0:
+                self.movePacman(games)
+            else:
+                self.moveGhost(games, agentIndex - 1)
+            self.numMoves[games] += 1
+            agentIndex = (agentIndex + 1) % (self.numGhosts + 1)
+        return self.score
+
+    def movePacman(self, games):
+        actions = self.pacmanPolicy(self, games)
+        if self.moves != None: self.moves.append((0, games, actions))
+        cells = self.nextCell[self.pacmanCell[games], actions]
+        if (cells < 0).any():
+            raise Exception("Illegal action " + ACTIONS[actions[cells < 0][0]])
+        self.pacmanCell[games] = cells
+        moved = actions != STOP
+        self.pacmanDirection[games[moved]] = actions[moved]
+        scoreChange = numpy.zeros(len(games), int)
+
+        # Eat food
+        ate = self.food[games, cells]
+        self.food[games[ate], cells[ate]] = False
+        self.numFood[games[ate]] -= 1
+        scoreChange[ate] += 10
+        won = ate & (self.numFood[games] == 0)
+        scoreChange[won] += 500
+        self.win[games[won]] = True
+
+        # Eat capsule
+        capsules = self.capsuleAt[cells]
+        onCapsule = capsules >= 0
+        ate = numpy.zeros(len(games), bool)
+        ate[onCapsule] = self.capsules[games[onCapsule], capsules[onCapsule]]
+        self.capsules[games[ate], capsules[ate]] = False
+        self.scaredTimer[games[ate]] = pacman.SCARED_TIME
+
+        scoreChange -= pacman.TIME_PENALTY
+        for ghost in range(self.numGhosts):
+            self.checkDeath(games, ghost, scoreChange)
+        self.score[games] += scoreChange
+
+    def moveGhost(self, games, ghost):
+        x2, y2 = self.ghostX2[games, ghost], self.ghostY2[games, ghost]
+        heading = self.ghostDirection[games, ghost]
+        scared = self.scaredTimer[games, ghost] > 0
+
+        # Legal actions: on a cell from the table, between cells straight on
+        onCell = (x2 % 2 == 0) & (y2 % 2 == 0)
+        cells = self.cellIndex[x2 // 2, y2 // 2]
+        legal = numpy.where(onCell, self.ghostLegalMask[cells, heading], 1 << heading)
+
+        # Ghosts cover a cell in two moves when scared: one doubled unit a move
+        step = numpy.where(scared, 1, 2)
+        if self.directional:
+            px2 = 2 * self.cellX[self.pacmanCell[games]]
+            py2 = 2 * self.cellY[self.pacmanCell[games]]
+            distances = numpy.array([abs(x2 + VECTOR_X[a] * step - px2) + abs(y2 + VECTOR_Y[a] * step - py2)
+                                     for a in range(len(ACTIONS))]).T
+            isLegal = (legal[:, None] >> numpy.arange(len(ACTIONS))) & 1 == 1
+            bestScore = numpy.where(scared, numpy.where(isLegal, distances, -1).max(1),
+                                    numpy.where(isLegal, distances, numpy.iinfo(int).max).min(1))
+            isBest = isLegal & (distances == bestScore[:, None])
+            best = (isBest << numpy.arange(len(ACTIONS))).sum(1)
+            keys = (scared * NUM_MASKS + legal) * NUM_MASKS + best
+        else:
+            keys = legal
+        actions = self.samples.sample(keys, self.draw(games))
+        if self.moves != None: self.moves.append((ghost + 1, games, actions))
+
+        x2 = x2 + VECTOR_X[actions] * step
+        y2 = y2 + VECTOR_Y[actions] * step
+        self.ghostDirection[games, ghost] = actions
+
+        # Time passes: a ghost that stops being scared snaps to the nearest cell
+        timer = self.scaredTimer[games, ghost]
+        snap = timer == 1
+        x2[snap] = (x2[snap] + 1) // 2 * 2
+        y2[snap] = (y2[snap] + 1) // 2 * 2
+        self.ghostX2[games, ghost], self.ghostY2[games, ghost] = x2, y2
+        self.scaredTimer[games, ghost] = numpy.maximum(0, timer - 1)
+
+        scoreChange = numpy.zeros(len(games), int)
+        self.checkDeath(games, ghost, scoreChange)
+        self.score[games] += scoreChange
+
+    def checkDeath(self, games, ghost, scoreChange):
+        "GhostRules.checkDeath and collide for one ghost, adding to scoreChange"
+        px2 = 2 * self.cellX[self.pacmanCell[games]]
+        py2 = 2 * self.cellY[self.pacmanCell[games]]
+        distance = abs(self.ghostX2[games, ghost] - px2) + abs(self.ghostY2[games, ghost] - py2)
+        collided = distance <= 2 * pacman.COLLISION_TOLERANCE
+        eaten = collided & (self.scaredTimer[games, ghost] > 0)
+        scoreChange[eaten] += 200
+        eatenGames = games[eaten]
+        self.ghostX2[eatenGames, ghost] = self.ghostStartX2[ghost]
+        self.ghostY2[eatenGames, ghost] = self.ghostStartY2[ghost]
+        self.ghostDirection[eatenGames, ghost] = STOP
+        self.scaredTimer[eatenGames, ghost] = 0
+        killed = collided & ~eaten & ~self.win[games]
+        scoreChange[killed] -= 500
+        self.lose[games[killed]] = True
+
+    def getMoveHistory(self, game):
+        "Game.moveHistory of one game: (agentIndex, action) pairs; needs recordMoves"
+        history = []
+        for agentIndex, games, actions in self.moves:
+            position = numpy.searchsorted(games, game)
+            if position < len(games) and games[position] == game:
+                history.append((agentIndex, ACTIONS[actions[position]]))
+        return history
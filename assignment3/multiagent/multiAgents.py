@@ -14,9 +14,10 @@
 from __future__ import print_function
 from util import manhattanDistance
 from game import Directions
-import random, util, sys
+import random, util, sys, time, math
 
 from game import Agent
+from game import Actions
 
 class ReflexAgent(Agent):
     """
@@ -115,6 +116,84 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
+class TranspositionTable:
+    """
+      A fixed-size table of search results, so a state reached again by
+      another move order (ghosts moving in either order, say) is not searched
+      again.  Entries are keyed by the state's hash, the plies of search left
+      below it and the agent to move, and hold the value, what kind of bound
+      it is (EXACT, or for alpha-beta LOWER or UPPER) and the best action.
+
+      The table holds as many entries as fit in the given number of
+      megabytes.  A key goes in one slot; a new entry replaces the one there
+      unless that one is from the current search and deeper.  Entries stay
+      valid across searches with the same evaluation function, so later
+      moves reuse them.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, megabytes):
+        sample = (sys.maxint, 0, 0, 0.5, self.EXACT, Directions.STOP, 0)
+        entryBytes = sys.getsizeof(sample) + sys.getsizeof(sys.maxint) + sys.getsizeof(0.5) + 8
+        self.size = max(1, int(megabytes * 2 ** 20 / entryBytes))
+        self.slots = [None] * self.size
+        self.used = 0
+        self.generation = 0
+        self.newSearch()
+
+    def newSearch(self):
+        "Starts the statistics of a new search; older entries become replaceable"
+        self.generation += 1
+        self.probes = self.hits = self.stores = self.replaced = 0
+
+    def slot(self, stateHash, depthLeft, agent):
+        return (stateHash + depthLeft * 0x9e3779b1 + agent * 0x85ebca77) % self.size
+
+    def lookup(self, gameState, depthLeft, agent):
+        "Returns the entry (stateHash, depthLeft, agent, value, bound, action, generation) or None"
+        self.probes += 1
+        stateHash = hash(gameState)
+        entry = self.slots[self.slot(stateHash, depthLeft, agent)]
+        if entry == None or entry[0] != stateHash or entry[1] != depthLeft or entry[2] != agent:
+            return None
+        self.hits += 1
+        return entry
+
+    def getBestAction(self, gameState, depthLeft, agent):
+        """
+          The best action stored for the state with depthLeft plies to go or,
+          failing that, one ply less (the last iteration of a deepening
+          search); None if neither is stored.  Not counted in the statistics.
+        """
+        stateHash = hash(gameState)
+        for plies in [depthLeft, depthLeft - 1]:
+            entry = self.slots[self.slot(stateHash, plies, agent)]
+            if entry != None and entry[0] == stateHash and entry[1] == plies and entry[2] == agent:
+                return entry[5]
+        return None
+
+    def store(self, gameState, depthLeft, agent, value, bound, action):
+        stateHash = hash(gameState)
+        index = self.slot(stateHash, depthLeft, agent)
+        old = self.slots[index]
+        if old == None:
+            self.used += 1
+        elif old[6] == self.generation and old[1] > depthLeft:
+            return
+        elif old[:3] != (stateHash, depthLeft, agent):
+            self.replaced += 1
+        self.slots[index] = (stateHash, depthLeft, agent, value, bound, action, self.generation)
+        self.stores += 1
+
+    def getStats(self):
+        "Statistics of the current search"
+        return {'probes': self.probes, 'hits': self.hits, 'hitRate': float(self.hits) / max(1, self.probes),
+                'stores': self.stores, 'replaced': self.replaced, 'used': self.used, 'size': self.size}
+
+class SearchTimeout(Exception):
+    "Raised inside a search when its time budget runs out"
+    pass
+
 class MultiAgentSearchAgent(Agent):
     """
       This class provides some common elements to all of your
@@ -130,11 +209,127 @@ class MultiAgentSearchAgent(Agent):
       is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', tt = '0', budget = '0', workers = '0',
+                 verbose = '0'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
 
+        # Optional search machinery, off by default (the graded searches
+        # must expand every state):
+        #   tt=MB      a transposition table of MB megabytes
+        #   budget=S   deepen one ply at a time for S seconds a move
+        #              instead of searching to depth
+        #   workers=N  search the subtrees under the root on N worker
+        #              processes (see parallelSearch.py); slower than
+        #              the serial search on one or two CPUs
+        #   verbose=1  print each search's statistics
+        self.transpositions = None
+        if float(tt) > 0:
+            self.transpositions = TranspositionTable(float(tt))
+        self.budget = float(budget)
+        self.deadline = None
+        self.workers = int(workers)
+        self.splitter = None
+        self.sharedAlpha = None     # In a worker, the best root value so far (see parallelSearch.py)
+        self.alphaUsed = None
+        if self.workers > 0 and self.budget > 0:
+            raise Exception('workers and budget cannot be used together')
+        self.verbose = verbose not in ['0', 'False', False]
+        self.rootValues = {}
+        self.nodes = 0
+        self.searchStats = {}
+
+    def searchAction(self, gameState, search):
+        """
+          Returns the action search(gameState) picks with self.depth, or with
+          a budget, the action of the deepest search that finished in time.
+        """
+        self.startSearch()
+        self.rootValues = {}
+        if self.budget > 0:
+            action = self.deepen(gameState, search)
+        elif self.workers > 0:
+            action = self.splitRoot(gameState)
+        else:
+            action = search(gameState)
+        self.finishSearch()
+        return action
+
+    def splitRoot(self, gameState):
+        "Returns the action search would, searching the root's subtrees on the worker pool"
+        import parallelSearch
+        if self.splitter != None and not self.splitter.fits(gameState):
+            self.splitter.close()
+            self.splitter = None
+        if self.splitter == None:
+            self.splitter = parallelSearch.RootSplitter(self, gameState, self.workers)
+        return self.splitter.search(gameState, self.rootActions(gameState))
+
+    def final(self, state):
+        "Stops the worker processes at the end of the game"
+        if self.splitter != None:
+            self.splitter.close()
+            self.splitter = None
+
+    def rootActions(self, gameState):
+        "Pacman's legal actions in the order the search tries them"
+        return self.orderRootActions(gameState.getLegalActions(0))
+
+    MAX_DEEPENING = 64
+
+    def deepen(self, gameState, search):
+        """
+          Searches to depth 1, 2, ... until self.budget seconds have passed.
+          Each search sees the root values of the one before in
+          self.rootValues and tries the best root actions first.
+        """
+        maxDepth, start = self.depth, time.time()
+        self.deadline = start + self.budget
+        action, completed = None, 0
+        try:
+            for depth in range(1, self.MAX_DEEPENING + 1):
+                self.depth = depth
+                action = search(gameState)
+                completed = depth
+        except SearchTimeout:
+            pass
+        finally:
+            self.depth, self.deadline = maxDepth, None
+        if action == None:
+            action = gameState.getLegalActions(self.index)[0]
+        self.deepeningStats = {'depth': completed, 'seconds': time.time() - start}
+        return action
+
+    def orderRootActions(self, legalActions):
+        "The root actions, best first by the values of the last (shallower) search"
+        if not self.rootValues:
+            return legalActions
+        values = self.rootValues
+        return sorted(legalActions, key=lambda action: -values.get(action, -sys.maxint))
+
+    def startSearch(self):
+        self.nodes = 0
+        if self.transpositions != None:
+            self.transpositions.newSearch()
+
+    def finishSearch(self):
+        "Records the statistics of the search just finished in searchStats"
+        self.searchStats = {'search': {'nodes': self.nodes}}
+        if self.transpositions != None and self.workers == 0:     # Workers keep their own tables
+            self.searchStats['tt'] = self.transpositions.getStats()
+        if self.budget > 0:
+            self.searchStats['deepening'] = self.deepeningStats
+        if self.splitter != None:
+            self.searchStats['parallel'] = {'tasks': self.splitter.tasks, 'researched': self.splitter.researched}
+        if self.verbose:
+            print(self.__class__.__name__, ', '.join(['%s %s' % (name, formatStats(stats))
+                                                     for name, stats in sorted(self.searchStats.items())]))
+
+def formatStats(stats):
+    return ' '.join(['%s=%s' % (key, isinstance(value, float) and '%.3f' % value or value)
+                     for key, value in sorted(stats.items())])
+
 class MinimaxAgent(MultiAgentSearchAgent):
     """
       Your minimax agent (question 2)
@@ -157,11 +352,28 @@ class MinimaxAgent(MultiAgentSearchAgent):
           gameState.getNumAgents():
             Returns the total number of agents in the game
         """
-        return self.minimax(gameState, 0, 0)
+        return self.searchAction(gameState, lambda state: self.minimax(state, 0, 0))
+
+    def subtreeValue(self, gameState, depth, agent, alpha):
+        return self.minimax(gameState, depth, agent)
+
+    def combineReplies(self, values):
+        "The value of a ghost node from its children's"
+        return min(values)
 
     def minimax(self, gameState, depth, agent):
         if depth == self.depth or gameState.isWin() or gameState.isLose():
             return self.evaluationFunction(gameState)
+        if self.deadline != None and time.time() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+
+        # A state already searched to the same depth has the same value
+        table = self.transpositions
+        if table != None and (agent != 0 or depth != 0):
+            entry = table.lookup(gameState, self.depth - depth, agent)
+            if entry != None:
+                return entry[3]
 
         # Crossed depth level once all agents have been evaluated
         nextAgent = (agent + 1) % gameState.getNumAgents()
@@ -170,31 +382,121 @@ class MinimaxAgent(MultiAgentSearchAgent):
             nextDepth += 1
 
         succUtilities = []
-        legalActions = gameState.getLegalActions(agent)
+        if agent == 0 and depth == 0:
+            legalActions = self.rootActions(gameState)
+        else:
+            legalActions = gameState.getLegalActions(agent)
         for action in legalActions:
             succUtility = self.minimax(gameState.generateSuccessor(agent, action), nextDepth, nextAgent)
             succUtilities.append(succUtility)
 
         # Return the output of Pacman's move
         if agent == 0 and depth == 0:
+            self.rootValues = dict(zip(legalActions, succUtilities))
             idx = succUtilities.index(max(succUtilities))
             return legalActions[idx]
 
         if agent == 0:
-            return max(succUtilities)
+            value = max(succUtilities)
         else:
-            return min(succUtilities)
+            value = min(succUtilities)
+        if table != None:
+            action = legalActions[succUtilities.index(value)]
+            table.store(gameState, self.depth - depth, agent, value, TranspositionTable.EXACT, action)
+        return value
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
       Your minimax agent with alpha-beta pruning (question 3)
+
+      With ordering=... (say ordering=pv+killer or ordering=all) the moves at
+      each node are tried best guess first, so more of the tree is pruned:
+        pv       the move that was best in this state the last time it was
+                 searched (taken from the transposition table with tt=MB)
+        killer   the last two moves that caused a cutoff at the same ply
+        history  moves that have caused cutoffs from the same position,
+                 weighted by the depth searched under them
+        static   Pacman eating food and moving away from active ghosts;
+                 ghosts moving toward Pacman, or away when scared
     """
+    ORDERINGS = ['pv', 'killer', 'history', 'static']
+    HISTORY_SIZE = 10000    # History entries kept between searches
+    BEST_MOVES_SIZE = 100000
+
+    def __init__(self, ordering = '', **args):
+        MultiAgentSearchAgent.__init__(self, **args)
+        if ordering in ['', 'none']:
+            self.ordering = []
+        elif ordering == 'all':
+            self.ordering = self.ORDERINGS
+        else:
+            self.ordering = ordering.split('+')
+        for name in self.ordering:
+            if name not in self.ORDERINGS:
+                raise Exception('Unknown move ordering: ' + name)
+        self.bestMoves = {}     # Best actions by state, for pv without a transposition table
+        self.killers = {}
+        self.history = {}
+
+    def startSearch(self):
+        MultiAgentSearchAgent.startSearch(self)
+        self.killers = {}
+
+        # Old cutoffs count for less; those that have decayed to nothing are
+        # dropped, and at most HISTORY_SIZE of the rest are kept
+        history = [(score / 2, key) for key, score in self.history.items() if score > 1]
+        if len(history) > self.HISTORY_SIZE:
+            history.sort(reverse=True)
+            del history[self.HISTORY_SIZE:]
+        self.history = dict([(key, score) for score, key in history])
+        if len(self.bestMoves) > self.BEST_MOVES_SIZE:
+            self.bestMoves = {}
+
+    def orderActions(self, gameState, legalActions, depth, agent):
+        "The legal actions, the ones most likely to cause a cutoff first"
+        ordering = self.ordering
+        pv = None
+        if 'pv' in ordering:
+            if self.transpositions != None:
+                pv = self.transpositions.getBestAction(gameState, self.depth - depth, agent)
+            else:
+                pv = self.bestMoves.get((hash(gameState), agent))
+        killers = 'killer' in ordering and self.killers.get(depth * gameState.getNumAgents() + agent) or ()
+        pos = gameState.data.agentStates[agent].configuration.pos
+        history = 'history' in ordering and self.history or {}
+        static = 'static' in ordering
+        def priority(action):
+            return (action == pv, action in killers, history.get((agent, pos, action), 0),
+                    static and staticMoveScore(gameState, agent, action) or 0)
+        return sorted(legalActions, key=priority, reverse=True)
+
+    def rootActions(self, gameState):
+        legalActions = gameState.getLegalActions(0)
+        if self.ordering:
+            legalActions = self.orderActions(gameState, legalActions, 0, 0)
+        return self.orderRootActions(legalActions)
+
+    def recordCutoff(self, gameState, depth, agent, action):
+        "Notes that action caused a cutoff, for the killer and history orderings"
+        ply = depth * gameState.getNumAgents() + agent
+        killers = self.killers.setdefault(ply, [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[2:]
+        key = (agent, gameState.data.agentStates[agent].configuration.pos, action)
+        self.history[key] = self.history.get(key, 0) + (self.depth - depth) ** 2
 
     def getAction(self, gameState):
         """
           Returns the minimax action using self.depth and self.evaluationFunction
         """
-        return self.alphabeta(gameState, 0, 0, -sys.maxint, sys.maxint)
+        return self.searchAction(gameState, lambda state: self.alphabeta(state, 0, 0, -sys.maxint, sys.maxint))
+
+    # Alpha-beta is split at the root only (see parallelSearch.py)
+    combineReplies = None
+
+    def subtreeValue(self, gameState, depth, agent, alpha):
+        return self.alphabeta(gameState, depth, agent, alpha, sys.maxint)
 
     # Note: At a max node n, beta is the lowest value of n's siblings seen so far
     # i.e. siblings to the left of n that have already been searched
@@ -205,16 +507,41 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
     def alphabeta(self, gameState, depth, agent, alpha, beta):
         if depth == self.depth or gameState.isWin() or gameState.isLose():
             return self.evaluationFunction(gameState)
+        if self.deadline != None and time.time() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+
+        # A worker searching a root subtree takes up a better root value
+        # found by another worker at Pacman's first moves in the subtree
+        if self.sharedAlpha != None and agent == 0 and depth == 1:
+            sharedAlpha = self.sharedAlpha.value
+            if alpha < sharedAlpha < beta:
+                alpha = sharedAlpha
+                self.alphaUsed = max(self.alphaUsed, alpha)
+
+        # A bound from the table that is outside (alpha, beta) prunes this
+        # node just as searching it would
+        table = self.transpositions
+        isRoot = agent == 0 and depth == 0
+        if table != None and not isRoot:
+            entry = table.lookup(gameState, self.depth - depth, agent)
+            if entry != None:
+                value, bound = entry[3], entry[4]
+                if bound == TranspositionTable.EXACT or \
+                   bound == TranspositionTable.LOWER and value >= beta or \
+                   bound == TranspositionTable.UPPER and value <= alpha:
+                    return value
+            alpha0, beta0 = alpha, beta
 
         # Crossed depth level once all agents have been evaluated
         nextAgent = (agent + 1) % gameState.getNumAgents()
         nextDepth = depth
         if nextAgent == 0:
             nextDepth += 1
-        legalActions = gameState.getLegalActions(agent)
 
         # Return the output of Pacman's move
         if agent == 0 and depth == 0:
+            legalActions = self.rootActions(gameState)
             succUtilities = []
             for action in legalActions:
                 succUtility = self.alphabeta(gameState.generateSuccessor(agent, action), nextDepth, nextAgent, alpha, beta)
@@ -222,23 +549,75 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
                 alpha = max(alpha, succUtility)
                 if beta <= alpha:
                     break
+            self.rootValues = dict(zip(legalActions, succUtilities))
             idx = succUtilities.index(max(succUtilities))
             return legalActions[idx]
 
+        legalActions = gameState.getLegalActions(agent)
+        if self.ordering:
+            legalActions = self.orderActions(gameState, legalActions, depth, agent)
+        bestAction = None
         if agent == 0:
             for action in legalActions:
                 utility = self.alphabeta(gameState.generateSuccessor(agent, action), nextDepth, nextAgent, alpha, beta)
+                if utility > alpha:
+                    bestAction = action
                 alpha = max(alpha, utility)
                 if beta <= alpha:
+                    if self.ordering: self.recordCutoff(gameState, depth, agent, action)
                     break
-            return alpha
+            value = alpha
         else:
             for action in legalActions:
                 utility = self.alphabeta(gameState.generateSuccessor(agent, action), nextDepth, nextAgent, alpha, beta)
+                if utility < beta:
+                    bestAction = action
                 beta = min(beta, utility)
                 if beta <= alpha:
+                    if self.ordering: self.recordCutoff(gameState, depth, agent, action)
                     break
-            return beta
+            value = beta
+
+        if self.ordering and bestAction != None and table == None:
+            self.bestMoves[(hash(gameState), agent)] = bestAction
+
+        if table != None:
+            if value <= alpha0:
+                bound = TranspositionTable.UPPER
+            elif value >= beta0:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+            table.store(gameState, self.depth - depth, agent, value, bound, bestAction)
+        return value
+
+def staticMoveScore(gameState, agent, action):
+    """
+      A cheap guess at how good action is for agent, from the distances it
+      changes: Pacman likes eating and moving away from ghosts that are not
+      scared (and toward scared ones), ghosts like closing on Pacman unless
+      they are scared.
+    """
+    agentStates = gameState.data.agentStates
+    x, y = agentStates[agent].configuration.pos
+    dx, dy = Actions.directionToVector(action)
+    newPos = (x + dx, y + dy)
+    if agent == 0:
+        score = 0
+        if gameState.data.food[int(newPos[0])][int(newPos[1])] or newPos in gameState.data.capsules:
+            score += 2
+        for ghostState in agentStates[1:]:
+            ghostPos = ghostState.configuration.pos
+            change = manhattanDistance(newPos, ghostPos) - manhattanDistance((x, y), ghostPos)
+            if ghostState.scaredTimer > 0:
+                change = -change
+            score += change
+        return score
+    pacmanPos = agentStates[0].configuration.pos
+    change = manhattanDistance(pacmanPos, (x, y)) - manhattanDistance(pacmanPos, newPos)
+    if agentStates[agent].scaredTimer > 0:
+        change = -change
+    return change
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
@@ -252,11 +631,26 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
           All ghosts should be modeled as choosing uniformly at random from their
           legal moves.
         """
-        return self.expectimax(gameState, 0, 0)
+        return self.searchAction(gameState, lambda state: self.expectimax(state, 0, 0))
+
+    def subtreeValue(self, gameState, depth, agent, alpha):
+        return self.expectimax(gameState, depth, agent)
+
+    def combineReplies(self, values):
+        return float(sum(values))/len(values)
 
     def expectimax(self, gameState, depth, agent):
         if depth == self.depth or gameState.isWin() or gameState.isLose():
             return self.evaluationFunction(gameState)
+        if self.deadline != None and time.time() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+
+        table = self.transpositions
+        if table != None and (agent != 0 or depth != 0):
+            entry = table.lookup(gameState, self.depth - depth, agent)
+            if entry != None:
+                return entry[3]
 
         # Crossed depth level once all agents have been evaluated
         nextAgent = (agent + 1) % gameState.getNumAgents()
@@ -265,22 +659,171 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
             nextDepth += 1
 
         succUtilities = []
-        legalActions = gameState.getLegalActions(agent)
+        if agent == 0 and depth == 0:
+            legalActions = self.rootActions(gameState)
+        else:
+            legalActions = gameState.getLegalActions(agent)
         for action in legalActions:
             succUtility = self.expectimax(gameState.generateSuccessor(agent, action), nextDepth, nextAgent)
             succUtilities.append(succUtility)
 
         # Return the output of Pacman's move
         if agent == 0 and depth == 0:
+            self.rootValues = dict(zip(legalActions, succUtilities))
             idx = succUtilities.index(max(succUtilities))
             return legalActions[idx]
 
         if agent == 0:
-            return max(succUtilities)
+            value = max(succUtilities)
+            action = legalActions[succUtilities.index(value)]
         else:
             # At a min node, return the average
-            avg = float(sum(succUtilities))/len(succUtilities)
-            return avg
+            value = float(sum(succUtilities))/len(succUtilities)
+            action = None
+        if table != None:
+            table.store(gameState, self.depth - depth, agent, value, TranspositionTable.EXACT, action)
+        return value
+
+class MCTSNode:
+    "A state in the MCTS tree, with its children by action and its playout statistics"
+    __slots__ = ('state', 'agent', 'children', 'untried', 'visits', 'total')
+
+    def __init__(self, state, agent):
+        self.state, self.agent = state, agent
+        self.children = {}
+        self.untried = None     # Pacman's actions with no child yet, listed on the first visit
+        self.visits = 0
+        self.total = 0.0
+
+    def size(self):
+        return 1 + sum([child.size() for child in self.children.values()])
+
+class MCTSAgent(Agent):
+    """
+      Monte Carlo tree search (UCT).  Each iteration walks down the tree,
+      picking Pacman's moves by the UCB1 bound and the ghosts' at random (as
+      ExpectimaxAgent models them), adds one state, plays a cheap random game
+      from it for at most rolloutDepth rounds and scores the state it ends in
+      with evalFn.  The move played is the root's most visited.
+
+      Options (with -a):
+        iterations=N   iterations per move
+        budget=S       search for S seconds a move instead
+        rolloutDepth=N rounds of moves per playout (random playouts are
+                       noisy, so short ones do better)
+        exploration=C  the UCB1 constant, in evalFn points
+        verbose=1      print each search's statistics
+
+      The tree under the state reached after the move and the ghosts' replies
+      is kept for the next move.
+    """
+
+    def __init__(self, evalFn = 'scoreEvaluationFunction', iterations = '200', budget = '0', rolloutDepth = '3',
+                 exploration = '100', seed = '0', verbose = '0'):
+        self.index = 0
+        self.evaluationFunction = util.lookup(evalFn, globals())
+        self.iterations = int(iterations)
+        self.budget = float(budget)
+        self.rolloutDepth = int(rolloutDepth)
+        self.exploration = float(exploration)
+        self.random = random.Random(int(seed))  # Private, so the ghosts' random choices are untouched
+        self.verbose = verbose not in ['0', 'False', False]
+        self.root, self.lastAction = None, None
+        self.searchStats = {}
+
+    def getAction(self, gameState):
+        root = self.reuseTree(gameState)
+        reused = root.visits
+        iterations, start = 0, time.time()
+        while (self.budget > 0 and time.time() - start < self.budget) or \
+              (self.budget <= 0 and iterations < self.iterations):
+            self.iterate(root)
+            iterations += 1
+
+        visits = dict([(action, child.visits) for action, child in root.children.items()])
+        action = max(root.state.getLegalActions(0), key=lambda action: visits.get(action, 0))
+        self.root, self.lastAction = root, action
+        self.searchStats = {'mcts': {'iterations': iterations, 'reused': reused, 'nodes': root.size()}}
+        if self.verbose:
+            print(self.__class__.__name__, 'mcts', formatStats(self.searchStats['mcts']))
+        return action
+
+    def reuseTree(self, gameState):
+        """
+          The node for gameState under the last move's child, found among
+          the states the ghosts' replies lead to, or a new root.
+        """
+        nodes = self.root and [self.root.children.get(self.lastAction)] or []
+        for ply in range(gameState.getNumAgents() - 1):
+            nodes = [child for node in nodes if node != None for child in node.children.values()]
+        for node in nodes:
+            if node != None and node.agent == 0 and node.state == gameState:
+                return node
+        return MCTSNode(gameState, 0)
+
+    def iterate(self, root):
+        "Runs one selection, expansion, playout and backup from root"
+        node, path, rng = root, [root], self.random
+        while not (node.state.isWin() or node.state.isLose()):
+            state, agent = node.state, node.agent
+            if agent == 0:
+                if node.untried == None:
+                    node.untried = state.getLegalActions(0)
+                if node.untried:
+                    action = node.untried.pop(rng.randrange(len(node.untried)))
+                else:
+                    action = self.selectAction(node)
+            else:
+                action = rng.choice(state.getLegalActions(agent))
+            child = node.children.get(action)
+            isNew = child == None
+            if isNew:
+                child = node.children[action] = MCTSNode(state.generateSuccessor(agent, action),
+                                                         (agent + 1) % state.getNumAgents())
+            path.append(child)
+            node = child
+            if isNew: break
+
+        value = self.rollout(node.state, node.agent)
+        for node in path:
+            node.visits += 1
+            node.total += value
+
+    def selectAction(self, node):
+        "The child action of a Pacman node with the highest UCB1 bound"
+        logVisits, exploration = math.log(node.visits), self.exploration
+        bestAction, bestBound = None, None
+        for action, child in node.children.items():
+            bound = child.total / child.visits + exploration * math.sqrt(logVisits / child.visits)
+            if bestAction == None or bound > bestBound:
+                bestAction, bestBound = action, bound
+        return bestAction
+
+    def rollout(self, state, agent):
+        """
+          Plays from state, agent to move, for rolloutDepth rounds: Pacman
+          eats food next to him when he can and otherwise moves at random
+          (not stopping), ghosts move at random.  Returns evalFn of the end.
+        """
+        rng, numAgents = self.random, state.getNumAgents()
+        moves = self.rolloutDepth * numAgents - agent
+        while moves > 0 and not (state.isWin() or state.isLose()):
+            actions = state.getLegalActions(agent)
+            if agent == 0:
+                if len(actions) > 1 and Directions.STOP in actions:
+                    actions.remove(Directions.STOP)
+                food, (x, y) = state.data.food, state.data.agentStates[0].configuration.pos
+                eating = []
+                for action in actions:
+                    dx, dy = Actions.directionToVector(action)
+                    if food[int(x + dx)][int(y + dy)]:
+                        eating.append(action)
+                if eating:
+                    actions = eating
+            state = state.generateSuccessor(agent, rng.choice(actions))
+            agent = (agent + 1) % numAgents
+            moves -= 1
+        return self.evaluationFunction(state)
 
 def betterEvaluationFunction(currentGameState):
     """
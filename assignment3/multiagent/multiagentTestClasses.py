@@ -142,6 +142,18 @@ def run(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
     print '*** Won %d out of %d games. Average score: %f ***' % (stats['wins'], len(games), sum(stats['scores']) * 1.0 / len(games))
     return stats
 
+def runTracked(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
+    """
+    Runs games as run does, with explored-state tracking on for agents
+    that count the states explored; the old setting is restored after.
+    """
+    wasTracking = GameState.trackExplored
+    GameState.setExploredTracking(True)
+    try:
+        return run(lay, layName, pac, ghosts, disp, nGames, name)
+    finally:
+        GameState.setExploredTracking(wasTracking)
+
 class GradingAgent(Agent):
     def __init__(self, seed, studentAgent, optimalActions, altDepthActions, partialPlyBugActions):
         # save student agent and actions of refernce agents
@@ -310,7 +322,8 @@ class PacmanGameTreeTest(testClasses.TestCase):
         pac = GradingAgent(self.seed, studentAgent, allActions, altDepthActions, partialPlyBugActions)
         # check return codes and assign grades
         disp = self.question.getDisplay()
-        stats = run(lay, self.layout_name, pac, [DirectionalGhost(i + 1) for i in range(2)], disp, name=self.alg)
+        # the number of states explored is graded
+        stats = runTracked(lay, self.layout_name, pac, [DirectionalGhost(i + 1) for i in range(2)], disp, name=self.alg)
         if stats['timeouts'] > 0:
             self.addMessage('Agent timed out on smallClassic.  No credit')
             return self.testFail(grades)
@@ -358,7 +371,8 @@ class PacmanGameTreeTest(testClasses.TestCase):
             ourPacOptions = {}
         pac = PolyAgent(self.seed, multiAgents, ourPacOptions, self.depth)
         disp = self.question.getDisplay()
-        run(lay, self.layout_name, pac, [DirectionalGhost(i + 1) for i in range(2)], disp, name=self.alg)
+        # the number of states explored is part of the solution
+        runTracked(lay, self.layout_name, pac, [DirectionalGhost(i + 1) for i in range(2)], disp, name=self.alg)
         (optimalActions, altDepthActions, partialPlyBugActions) = pac.getTraces()
         # recover traces and record to file
         handle = open(filePath, 'w')
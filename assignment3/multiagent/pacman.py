@@ -43,6 +43,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import internConfiguration
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -52,7 +53,7 @@ import sys, types, time, random, os
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
 ###################################################
 
-class GameState:
+class GameState(object):
     """
     A GameState specifies the full game state, including the food, capsules,
     agent configurations and score changes.
@@ -66,19 +67,43 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
+
+    def __getstate__( self ):
+        return self.data
+
+    def __setstate__( self, data ):
+        self.data = data
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # Explored-state tracking is instrumentation for the autograder, off
+    # unless turned on with setExploredTracking(True).  While on, the
+    # static variable explored collects the hashes of the states that
+    # generateSuccessor is called on and returns, one entry per distinct state.
+    trackExplored = False
     explored = set()
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
+        tmp = GameState.explored
         GameState.explored = set()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def setExploredTracking(enabled):
+        "Turns explored-state tracking on or off; turning it off drops the record"
+        GameState.trackExplored = enabled
+        if not enabled:
+            GameState.explored = set()
+    setExploredTracking = staticmethod(setExploredTracking)
+
+    def getExploredStats():
+        "Returns (number of states recorded, approximate bytes used by the record)"
+        explored = GameState.explored
+        return len(explored), sys.getsizeof(explored) + sum([sys.getsizeof(h) for h in explored])
+    getExploredStats = staticmethod(getExploredStats)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -112,7 +137,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.agentStateForWrite(agentIndex) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -120,8 +145,10 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        state.data.updateHash( self.data )
+        if GameState.trackExplored:
+            GameState.explored.add(hash(self))
+            GameState.explored.add(hash(state))
         return state
 
     def getLegalPacmanActions( self ):
@@ -331,9 +358,27 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        configuration = state.data.agentStates[0].configuration
+        actions = PacmanRules.getActionTable( state.data.layout ).get( configuration.pos )
+        if actions == None:     # Not on a cell
+            return Actions.getPossibleActions( configuration, state.data.layout.walls )
+        return list( actions )
     getLegalActions = staticmethod( getLegalActions )
 
+    def getActionTable( layout ):
+        """
+        Returns {(x, y): actions} for every open cell of the layout, built
+        the first time the layout is played on.
+        """
+        table = layout.actionTables.get( 'pacman' )
+        if table == None:
+            table = layout.actionTables['pacman'] = {}
+            for cell in layout.walls.asList( False ):
+                configuration = internConfiguration( cell, Directions.STOP )
+                table[cell] = tuple( Actions.getPossibleActions( configuration, layout.walls ) )
+        return table
+    getActionTable = staticmethod( getActionTable )
+
     def applyAction( state, action ):
         """
         Edits the state to reflect the results of the action.
@@ -342,7 +387,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.agentStateForWrite(0)
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -361,21 +406,21 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
+            state.data.food = state.data.food.copy()     # The food is shared with the previous state
             state.data.food[x][y] = False
             state.data._foodEaten = position
-            # TODO: cache numFood?
             numFood = state.getNumFood()
             if numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
+            state.data.capsules = state.data.capsules[:]     # Shared with the previous state too
             state.data.capsules.remove( position )
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.agentStateForWrite(index).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -388,15 +433,37 @@ class GhostRules:
         Ghosts cannot stop, and cannot turn around unless they
         reach a dead end, but can turn 90 degrees at intersections.
         """
-        conf = state.getGhostState( ghostIndex ).configuration
-        possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
-        reverse = Actions.reverseDirection( conf.direction )
+        conf = state.data.agentStates[ghostIndex].configuration
+        headings = GhostRules.getActionTable( state.data.layout ).get( conf.pos )
+        if headings == None:    # Between cells, as scared ghosts move at half speed
+            return GhostRules.filterActions( Actions.getPossibleActions( conf, state.data.layout.walls ), conf.direction )
+        return list( headings[conf.direction] )
+    getLegalActions = staticmethod( getLegalActions )
+
+    def filterActions( possibleActions, direction ):
+        "Removes STOP and, unless it is the only way out, the reverse of direction"
+        reverse = Actions.reverseDirection( direction )
         if Directions.STOP in possibleActions:
             possibleActions.remove( Directions.STOP )
         if reverse in possibleActions and len( possibleActions ) > 1:
             possibleActions.remove( reverse )
         return possibleActions
-    getLegalActions = staticmethod( getLegalActions )
+    filterActions = staticmethod( filterActions )
+
+    def getActionTable( layout ):
+        """
+        Returns {(x, y): {direction: actions}}, the legal actions for every
+        open cell of the layout and heading, built the first time the layout
+        is played on.
+        """
+        table = layout.actionTables.get( 'ghost' )
+        if table == None:
+            table = layout.actionTables['ghost'] = {}
+            for cell, actions in PacmanRules.getActionTable( layout ).items():
+                table[cell] = dict( [(direction, tuple( GhostRules.filterActions( list( actions ), direction ) ))
+                                     for direction in Actions._directions] )
+        return table
+    getActionTable = staticmethod( getActionTable )
 
     def applyAction( state, action, ghostIndex):
 
@@ -404,7 +471,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.agentStateForWrite(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -414,7 +481,8 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            configuration = ghostState.configuration
+            ghostState.configuration = internConfiguration( nearestPoint( configuration.pos ), configuration.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -425,12 +493,12 @@ class GhostRules:
                 ghostState = state.data.agentStates[index]
                 ghostPosition = ghostState.configuration.getPosition()
                 if GhostRules.canKill( pacmanPosition, ghostPosition ):
-                    GhostRules.collide( state, ghostState, index )
+                    GhostRules.collide( state, state.data.agentStateForWrite(index), index )
         else:
             ghostState = state.data.agentStates[agentIndex]
             ghostPosition = ghostState.configuration.getPosition()
             if GhostRules.canKill( pacmanPosition, ghostPosition ):
-                GhostRules.collide( state, ghostState, agentIndex )
+                GhostRules.collide( state, state.data.agentStateForWrite(agentIndex), agentIndex )
     checkDeath = staticmethod( checkDeath )
 
     def collide( state, ghostState, agentIndex):
@@ -523,6 +591,9 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Play the games on a pool of this many processes (needs -q); '
+                                   'learning agents do not share what they learn between processes'), default=0)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -570,6 +641,9 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
+    if options.workers > 0 and not options.quietGraphics:
+        raise Exception('--workers plays games without graphics; use it with -q')
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -608,6 +682,7 @@ def loadAgent(pacman, nographics):
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
 def replayGame( layout, actions, display ):
+    "Plays the recorded actions on layout; returns the final state"
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
     agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
@@ -624,11 +699,15 @@ def replayGame( layout, actions, display ):
         rules.process(state, game)
 
     display.finish()
+    return state
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, workers=0 ):
     import __main__
     __main__.__dict__['_display'] = display
 
+    if workers > 0:
+        return runGamesInPool( layout, pacman, ghosts, numGames, record, numTraining, catchExceptions, timeout, workers )
+
     rules = ClassicGameRules(timeout)
     games = []
 
@@ -646,25 +725,92 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         game.run()
         if not beQuiet: games.append(game)
 
-        if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+        if record: recordGame( i, layout, game.moveHistory )
 
     if (numGames-numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True)/ float(len(wins))
-        print 'Average Score:', sum(scores) / float(len(scores))
-        print 'Scores:       ', ', '.join([str(score) for score in scores])
-        print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
-        print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        printSummary( [game.state.getScore() for game in games], [game.state.isWin() for game in games] )
 
     return games
 
+def recordGame( i, layout, moveHistory ):
+    "Writes the history of game i to a file named by the time it was played"
+    import time, cPickle
+    fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = file(fname, 'w')
+    components = {'layout': layout, 'actions': moveHistory}
+    cPickle.dump(components, f)
+    f.close()
+
+def printSummary( scores, wins ):
+    winRate = wins.count(True)/ float(len(wins))
+    print 'Average Score:', sum(scores) / float(len(scores))
+    print 'Scores:       ', ', '.join([str(score) for score in scores])
+    print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
+    print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+
+class GameResult:
+    """
+    What a worker process sends back about a game it played: the game's
+    index and seed, plus the parts of the Game that callers of runGames
+    read (the final state, the move history, whether an agent timed out or
+    crashed, and each agent's total computing time).
+    """
+    def __init__( self, index, seed, game ):
+        self.index = index
+        self.seed = seed
+        self.state = game.state
+        self.moveHistory = game.moveHistory
+        self.agentTimeout = game.agentTimeout
+        self.agentCrashed = game.agentCrashed
+        self.totalAgentTimes = game.totalAgentTimes
+
+def runGamesInPool( layout, pacman, ghosts, numGames, record, numTraining, catchExceptions, timeout, workers ):
+    """
+    Plays the games of runGames on a pool of worker processes, without
+    graphics, and returns a GameResult for each game that is not a training
+    game.  A GameResult stands in for the Game: it has the same state,
+    moveHistory, agentTimeout, agentCrashed and totalAgentTimes.
+
+    Game i is played after random.seed(seeds[i]), with the seeds drawn from
+    random up front, so the games do not depend on which worker plays them
+    or when; with -f a run is reproducible (though not the same games as a
+    run without --workers).  Results are collected as games finish and the
+    summary lists them in game order.
+    """
+    import multiprocessing
+    seeds = [random.randint(0, sys.maxint) for i in range( numGames )]
+    pool = multiprocessing.Pool( workers, initWorker, (layout, pacman, ghosts, numTraining, catchExceptions, timeout) )
+    results = [None] * numGames
+    try:
+        for result in pool.imap_unordered( playWorkerGame, enumerate( seeds ) ):
+            results[result.index] = result
+            if record: recordGame( result.index, layout, result.moveHistory )
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    results = results[numTraining:]
+    if len(results) > 0:
+        printSummary( [result.state.getScore() for result in results], [result.state.isWin() for result in results] )
+    return results
+
+WORKER_GAME = None  # The arguments of the games a worker process plays, set by initWorker
+
+def initWorker( *gameArgs ):
+    global WORKER_GAME
+    WORKER_GAME = gameArgs
+
+def playWorkerGame( (i, seed) ):
+    "Plays game i in a worker process and returns its GameResult"
+    import textDisplay
+    layout, pacman, ghosts, numTraining, catchExceptions, timeout = WORKER_GAME
+    random.seed( seed )
+    rules = ClassicGameRules( timeout )
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), i < numTraining, catchExceptions )
+    game.run()
+    return GameResult( i, seed, game )
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -0,0 +1,248 @@
+# parallelSearch.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Root splitting for the multi-agent searches (workers=N in multiAgents.py).
+
+The subtrees under the root are searched on a pool of worker processes that
+lives as long as the agent.  The root state is written as numbers into shared
+memory (SharedState) rather than pickled; a task is just the moves from the
+root to its subtree.  Minimax and expectimax split at Pacman's move and the
+first ghost's reply.  Alpha-beta searches Pacman's first move, then the rest
+in parallel, each starting from the best value found so far (shared between
+the workers, and read again at the subtree's first Pacman moves, so a better
+value found meanwhile by another worker prunes it too); a result that is only
+a bound and might tie the best value is searched again, so the move chosen is
+the one the serial search picks.
+(With ordering=pv, killer or history the root moves are ordered from the
+tables of the agent in the main process, which does not search, so ties may
+be broken differently than by a serial agent.)
+
+Each worker has its own copy of the agent, including any transposition
+table.
+
+This only pays off with several CPUs.  The tasks are small, so with one or
+two CPUs passing them to the workers and back costs more than it saves, and
+workers=N is slower than the serial search (benchmark.py parallel measured
+0.6 to 1.1 times the serial speed on one CPU).
+"""
+
+import multiprocessing, sys
+from game import Directions, internConfiguration
+
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+
+class SharedState:
+    """
+    A GameState's score, agent states, capsules and food kept as doubles in
+    shared memory.  The layout and the state class are fixed when the pool
+    starts, and workers inherit them.
+    """
+    AGENT_FIELDS = 9    # x, y, x is an int, y is an int, direction, scaredTimer, isPacman, numCarrying, numReturned
+    FOOD_BITS = 30      # Bits of the food board per double
+
+    def __init__(self, stateClass, layout, numAgents):
+        self.stateClass, self.layout, self.numAgents = stateClass, layout, numAgents
+        self.foodChunks = (layout.width * layout.height + self.FOOD_BITS - 1) // self.FOOD_BITS
+        size = 3 + numAgents * self.AGENT_FIELDS + 1 + 2 * len(layout.capsules) + 1 + self.foodChunks
+        self.values = multiprocessing.Array('d', size, lock=False)
+
+    def write(self, moveId, gameState):
+        data, values = gameState.data, self.values
+        values[0], values[1], values[2] = moveId, data.score, type(data.score) == int
+        i = 3
+        for agentState in data.agentStates:
+            configuration = agentState.configuration
+            x, y = configuration.pos
+            values[i:i + self.AGENT_FIELDS] = [x, y, type(x) == int, type(y) == int,
+                                               DIRECTIONS.index(configuration.direction), agentState.scaredTimer,
+                                               agentState.isPacman, agentState.numCarrying, agentState.numReturned]
+            i += self.AGENT_FIELDS
+        values[i] = len(data.capsules)
+        for x, y in data.capsules:
+            values[i + 1], values[i + 2] = x, y
+            i += 2
+        bits, count = data.food.board
+        values[i + 1] = count
+        mask = (1 << self.FOOD_BITS) - 1
+        for chunk in range(self.foodChunks):
+            values[i + 2 + chunk] = bits >> (chunk * self.FOOD_BITS) & mask
+
+    def read(self):
+        "Returns (moveId, the GameState last written)"
+        values = self.values
+        state = self.stateClass()
+        state.initialize(self.layout, self.numAgents - 1)
+        data = state.data
+        data.score = int(values[1]) if values[2] else values[1]
+        i = 3
+        for agentState in data.agentStates:
+            x, y, xIsInt, yIsInt, direction, scaredTimer, isPacman, numCarrying, numReturned = \
+                values[i:i + self.AGENT_FIELDS]
+            pos = (int(x) if xIsInt else x, int(y) if yIsInt else y)
+            agentState.configuration = internConfiguration(pos, DIRECTIONS[int(direction)])
+            agentState.scaredTimer, agentState.isPacman = int(scaredTimer), bool(isPacman)
+            agentState.numCarrying, agentState.numReturned = int(numCarrying), int(numReturned)
+            i += self.AGENT_FIELDS
+        data.capsules = [(int(values[i + 1 + 2 * c]), int(values[i + 2 + 2 * c])) for c in range(int(values[i]))]
+        i += 1 + 2 * len(data.capsules)
+        bits = 0
+        for chunk in range(self.foodChunks):
+            bits |= int(values[i + 1 + chunk]) << (chunk * self.FOOD_BITS)
+        data.food.board = [bits, int(values[i])]
+        data._hash = data.computeHash()
+        return int(values[0]), state
+
+class RootSplitter:
+    """
+    A pool of worker processes searching the subtrees under agent's root
+    states.  It is made for one layout and number of agents.
+    """
+    def __init__(self, agent, gameState, workers):
+        self.agent, self.layout = agent, gameState.data.layout
+        self.shared = SharedState(gameState.__class__, self.layout, gameState.getNumAgents())
+        self.alpha = multiprocessing.Value('d', -sys.maxint)
+        self.pool = multiprocessing.Pool(workers, initWorker, (agent, self.shared, self.alpha))
+        self.moveId = 0
+
+    def fits(self, gameState):
+        return gameState.data.layout is self.layout and gameState.getNumAgents() == self.shared.numAgents
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def search(self, gameState, rootActions):
+        """
+          Returns the action the agent's serial search picks among
+          rootActions (in that order), and adds the workers' node counts to
+          agent.nodes.
+        """
+        self.moveId += 1
+        self.shared.write(self.moveId, gameState)
+        self.tasks = self.researched = 0
+        if self.agent.combineReplies == None:
+            values = self.searchAlphaBeta(rootActions)
+        else:
+            values = [self.searchChild(gameState, action) for action in rootActions]
+            values = [value.get() for value in values]
+        self.agent.rootValues = dict(zip(rootActions, values))
+        return rootActions[values.index(max(values))]
+
+    def submit(self, path, alpha = None):
+        self.tasks += 1
+        return self.pool.apply_async(searchSubtree, ((self.moveId, path, alpha),))
+
+    def collect(self, result):
+        value, alphaUsed, nodes = result.get()
+        self.agent.nodes += nodes
+        return value, alphaUsed
+
+    def searchChild(self, gameState, action):
+        """
+          Starts the search of Pacman's action, split at the first ghost's
+          replies when it has any; returns an object whose get() is the value.
+        """
+        agent = self.agent
+        child = gameState.generateSuccessor(0, action)
+        if gameState.getNumAgents() == 1 or agent.depth == 0 or child.isWin() or child.isLose():
+            return Combined(self, [self.submit((action,))], None)
+        replies = child.getLegalActions(1)
+        return Combined(self, [self.submit((action, reply)) for reply in replies], agent.combineReplies)
+
+    def searchAlphaBeta(self, rootActions):
+        """
+          Young brothers wait: the first action is searched alone to get a
+          bound, then the others together.  Returns the root values as the
+          serial alpha-beta would use them.
+        """
+        self.alpha.value = -sys.maxint
+        first, alphaUsed = self.collect(self.submit((rootActions[0],), -sys.maxint))
+        self.alpha.value = first
+        results = [self.collect(result) for result in
+                   [self.submit((action,)) for action in rootActions[1:]]]
+
+        # A value above the alpha it was searched with is exact; at or below
+        # it, it is only an upper bound.  A bound equal to the best value may
+        # hide a tie with an earlier action, so that action is searched again.
+        # The first action's value counts as exact even if it is no more than
+        # -sys.maxint, as it does in the serial search.
+        best = max([first] + [value for value, alphaUsed in results if value > alphaUsed])
+        values = [first]
+        if first == best:
+            return values
+        for action, (value, alphaUsed) in zip(rootActions[1:], results):
+            if value <= alphaUsed and alphaUsed >= best:
+                self.researched += 1
+                value, alphaUsed = self.collect(self.submit((action,), -sys.maxint))
+            values.append(value)
+            if value > alphaUsed and value == best:
+                break
+        return values
+
+class Combined:
+    "The value of a node from its subtrees' results, once they are in"
+    def __init__(self, splitter, results, combine):
+        self.splitter, self.results, self.combine = splitter, results, combine
+
+    def get(self):
+        values = [self.splitter.collect(result)[0] for result in self.results]
+        if self.combine == None:
+            return values[0]
+        return self.combine(values)
+
+WORKER = None   # (agent, SharedState, shared alpha, (moveId, root state)), set by initWorker
+
+def initWorker(agent, shared, alpha):
+    global WORKER
+    agent.workers = 0
+    WORKER = [agent, shared, alpha, (None, None)]
+
+def searchSubtree((moveId, path, alpha)):
+    """
+      Searches the subtree reached from root state moveId by the moves in
+      path.  For alpha-beta the search starts from alpha or, if alpha is
+      None, from the shared alpha, which it keeps taking up as it improves.
+      Returns (value, highest alpha used, nodes searched).
+    """
+    agent, shared, sharedAlpha, (rootId, root) = WORKER
+    if rootId != moveId:
+        rootId, root = shared.read()
+        if rootId != moveId:
+            raise Exception('Worker asked for root %d but found %d' % (moveId, rootId))
+        WORKER[3] = (rootId, root)
+
+    state, depth, agentIndex = root, 0, 0
+    for action in path:
+        state = state.generateSuccessor(agentIndex, action)
+        agentIndex = (agentIndex + 1) % state.getNumAgents()
+        if agentIndex == 0:
+            depth += 1
+
+    agent.startSearch()
+    if agent.combineReplies != None:    # Minimax and expectimax have no alpha
+        return agent.subtreeValue(state, depth, agentIndex, alpha), alpha, agent.nodes
+
+    agent.sharedAlpha = None
+    if alpha == None:
+        alpha = sharedAlpha.value
+        agent.sharedAlpha = sharedAlpha
+    agent.alphaUsed = alpha
+    value = agent.subtreeValue(state, depth, agentIndex, alpha)
+    alpha = agent.alphaUsed
+    if value > alpha:
+        with sharedAlpha.get_lock():
+            if value > sharedAlpha.value:
+                sharedAlpha.value = value
+    return value, alpha, agent.nodes
@@ -15,6 +15,7 @@
 import sys
 import inspect
 import heapq, random
+import collections
 import cStringIO
 
 
@@ -137,11 +138,15 @@ class Stack:
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()     # Newest item on the left, O(1) at both ends
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.appendleft(item)
+
+    def pushMany(self, items):
+        "Enqueue every item of 'items', in order"
+        self.list.extendleft(items)
 
     def pop(self):
         """
@@ -580,20 +585,42 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# A TimeoutFunction call pushes its deadline on a per-thread stack and one
+# watchdog thread, started on first use, polls the stacks.  When a call runs
+# past its deadline the watchdog raises TimeoutExpired asynchronously in its
+# thread, and the call turns it into TimeoutFunctionException.  Nothing
+# happens per call beyond the push and pop (no signals or alarms), and
+# timeouts nest: an inner timeout neither cancels nor extends the ones around
+# it, and TimeoutExpired is not an Exception, so it goes through inner calls
+# and their handlers to the call whose deadline passed.
 #
-import signal
-import time
+# The exception lands when the thread next runs Python code, so a thread
+# blocked in a long C call (a sleep, a read) sees it only once the call
+# returns.  Without ctypes the time is checked after the function returns.
+#
+import time, thread
+try:
+    import ctypes
+    _setAsyncExc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+except (ImportError, AttributeError):
+    _setAsyncExc = None
+
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
 
+class TimeoutExpired(BaseException):
+    """Raised inside a timed function that is out of time; not for catching"""
+    pass
+
 
 class TimeoutFunction:
+    WATCHDOG_INTERVAL = 0.05    # Seconds between the watchdog's checks
+
+    _stacks = {}                # thread id -> [deadline, fired] of its active calls, innermost last
+    _lock = thread.allocate_lock()
+    _watchdog = None
+
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
@@ -602,25 +629,92 @@ class TimeoutFunction:
         raise TimeoutFunctionException()
 
     def __call__(self, *args, **keyArgs):
-        # If we have SIGALRM signal, use it to cause an exception if and
-        # when this function runs too long.  Otherwise check the time taken
-        # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
-            old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
-            try:
-                result = self.function(*args, **keyArgs)
-            finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-        else:
-            startTime = time.time()
+        # A timeout of 0 means none, as it did with signal.alarm
+        if self.timeout <= 0:
+            return self.function(*args, **keyArgs)
+        startTime = time.time()
+        if _setAsyncExc == None:
             result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
-            if timeElapsed >= self.timeout:
+            if time.time() - startTime >= self.timeout:
                 self.handle_timeout(None, None)
+            return result
+
+        if TimeoutFunction._watchdog == None:
+            TimeoutFunction._startWatchdog()
+        threadId = thread.get_ident()
+        stack = TimeoutFunction._stacks.setdefault(threadId, [])
+        entry = [startTime + self.timeout, False]
+        stack.append(entry)
+        try:
+            try:
+                result = self.function(*args, **keyArgs)
+            except TimeoutExpired:
+                if not entry[1]: raise      # An enclosing call's
+        finally:
+            # Taking the entry off under the lock keeps the watchdog from
+            # firing for it afterwards; the loop takes a TimeoutExpired that
+            # arrives meanwhile.  (with releases the lock whatever happens.)
+            late = False
+            while True:
+                try:
+                    with TimeoutFunction._lock:
+                        if stack and stack[-1] is entry:
+                            stack.pop()
+                        else:
+                            TimeoutFunction._unwind(stack, entry)
+                        if entry[1]:
+                            TimeoutFunction._dropPending(threadId, stack)
+                    break
+                except TimeoutExpired:
+                    late = True
+            if late and not entry[1]:
+                raise TimeoutExpired()
+        if entry[1]:
+            # Out of time, possibly with the function having returned anyway
+            self.handle_timeout(None, None)
         return result
 
+    def _unwind(stack, entry):
+        "Takes entry, and any entries left above it, off the stack if it is still there"
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is entry:
+                del stack[i:]
+                return
+    _unwind = staticmethod(_unwind)
+
+    def _dropPending(threadId, stack):
+        "Drops a TimeoutExpired not delivered yet, unless it is for an enclosing call"
+        for deadline, fired in stack:
+            if fired: return
+        _setAsyncExc(ctypes.c_long(threadId), None)
+    _dropPending = staticmethod(_dropPending)
+
+    def _startWatchdog():
+        TimeoutFunction._lock.acquire()
+        if TimeoutFunction._watchdog == None:
+            TimeoutFunction._watchdog = thread.start_new_thread(TimeoutFunction._watch, ())
+        TimeoutFunction._lock.release()
+    _startWatchdog = staticmethod(_startWatchdog)
+
+    def _watch():
+        "The watchdog thread's loop; it only uses locals, so it is safe at interpreter exit"
+        stacks, lock, interval = TimeoutFunction._stacks, TimeoutFunction._lock, TimeoutFunction.WATCHDOG_INTERVAL
+        sleep, clock, setAsyncExc = time.sleep, time.time, _setAsyncExc
+        c_long, exception = ctypes.c_long, ctypes.py_object(TimeoutExpired)
+        while True:
+            sleep(interval)
+            now = clock()
+            lock.acquire()
+            for threadId, stack in stacks.items():
+                # The outermost call out of time is the one to stop
+                for entry in stack:
+                    if entry[0] <= now:
+                        if not entry[1]:
+                            entry[1] = True
+                            setAsyncExc(c_long(threadId), exception)
+                        break
+            lock.release()
+    _watch = staticmethod(_watch)
 
 
 _ORIGINAL_STDOUT = None